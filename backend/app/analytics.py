@@ -0,0 +1,209 @@
+"""
+Pre-aggregated sales rollups for admin analytics.
+
+Every placed order adds its totals to hourly and daily `order_rollups`
+buckets and its lines to `product_sales_daily`. Cancelling an order
+subtracts it again, un-cancelling adds it back. Buckets are UTC and keyed on
+the order's created_at.
+
+The order's transaction only queues a `pending_rollups` row; the
+analytics-rollups job folds them in every ANALYTICS_ROLLUP_INTERVAL seconds.
+Upserting the current hour's bucket at checkout would make every concurrent
+checkout wait on that one row's lock.
+
+Revenue is net of GST everywhere: the sum of price * quantity over the order
+lines, so order, product and category figures add up to the same totals.
+(Order.total_amount includes the 18% GST and is not used here.)
+
+Backfill (rebuilds all rollups from orders and the order archive):
+    python -m app.analytics backfill
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from .database import SessionLocal, engine
+from .models import Order, OrderItem, Product, OrderRollup, ProductSalesDaily, PendingRollup
+from .migrations import sync_schema
+from . import archive
+
+GRANULARITIES = ("hour", "day")
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _upsert(db: Session, model, key_columns: Tuple[str, ...], rows: Iterable[dict], sum_columns: Tuple[str, ...]):
+    """Insert rows, adding `sum_columns` onto any existing row with the same key"""
+    rows = list(rows)
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in sum_columns}
+        )
+        db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        existing = db.query(model).filter_by(**{k: row[k] for k in key_columns}).with_for_update().first()
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for column in sum_columns:
+                setattr(existing, column, getattr(existing, column) + row[column])
+    db.flush()
+
+
+def _apply(db: Session, orders: Iterable[Tuple[datetime, Iterable[Tuple[int, int, int, float]]]], sign: int):
+    """Fold (created_at, [(product_id, category_id, quantity, price)]) into the rollups"""
+    order_buckets: Dict[Tuple[str, datetime], list] = defaultdict(lambda: [0, 0, 0.0])
+    product_days: Dict[Tuple[datetime, int], list] = defaultdict(lambda: [None, 0, 0, 0.0])
+
+    for created_at, lines in orders:
+        lines = list(lines)
+        units = sum(quantity for _, _, quantity, _ in lines)
+        revenue = sum(quantity * (price or 0) for _, _, quantity, price in lines)
+        for granularity in GRANULARITIES:
+            bucket = order_buckets[(granularity, bucket_start(created_at, granularity))]
+            bucket[0] += sign
+            bucket[1] += sign * units
+            bucket[2] += sign * revenue
+        day = bucket_start(created_at, "day")
+        for product_id in {product_id for product_id, _, _, _ in lines}:
+            product_days[(day, product_id)][1] += sign
+        for product_id, category_id, quantity, price in lines:
+            entry = product_days[(day, product_id)]
+            entry[0] = category_id
+            entry[2] += sign * quantity
+            entry[3] += sign * quantity * (price or 0)
+
+    _upsert(db, OrderRollup, ("granularity", "bucket_start"), (
+        {"granularity": granularity, "bucket_start": start, "order_count": count, "units": units, "revenue": revenue}
+        for (granularity, start), (count, units, revenue) in order_buckets.items()
+    ), ("order_count", "units", "revenue"))
+    _upsert(db, ProductSalesDaily, ("day", "product_id"), (
+        {"day": day, "product_id": product_id, "category_id": category_id, "order_count": count, "units": units, "revenue": revenue}
+        for (day, product_id), (category_id, count, units, revenue) in product_days.items()
+    ), ("order_count", "units", "revenue"))
+
+
+def _lines_by_order(db: Session, order_ids: List[int]) -> Dict[int, list]:
+    lines = defaultdict(list)
+    for order_id, product_id, category_id, quantity, price in db.query(
+        OrderItem.order_id, OrderItem.product_id, Product.category_id, OrderItem.quantity, OrderItem.price
+    ).join(Product, Product.id == OrderItem.product_id).filter(OrderItem.order_id.in_(order_ids)):
+        lines[order_id].append((product_id, category_id, quantity, price))
+    return lines
+
+
+def record_order(db: Session, order: Order, sign: int = 1):
+    """Queue adding (sign=1) or removing (sign=-1) an order's totals. Call inside the order's transaction after flush."""
+    db.add(PendingRollup(order_id=order.id, sign=sign))
+
+
+def fold_pending(db: Session, batch_size: int = 5000) -> int:
+    """Apply queued orders to the rollups. Returns the number applied."""
+    folded = 0
+    while True:
+        # Skip rows another worker is folding
+        pending = db.query(PendingRollup.id, PendingRollup.order_id, PendingRollup.sign).order_by(
+            PendingRollup.id
+        ).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not pending:
+            break
+        order_ids = list({row.order_id for row in pending})
+        created = dict(db.query(Order.id, Order.created_at).filter(Order.id.in_(order_ids)))
+        lines = _lines_by_order(db, order_ids)
+        for sign in (1, -1):
+            # Orders archived in the meantime are skipped; a backfill counts them again
+            _apply(db, (
+                (created[row.order_id], lines[row.order_id])
+                for row in pending if row.sign == sign and row.order_id in created
+            ), sign)
+        db.execute(delete(PendingRollup).where(PendingRollup.id.in_([row.id for row in pending])))
+        db.commit()
+        folded += len(pending)
+        if len(pending) < batch_size:
+            break
+    return folded
+
+
+def fold_job():
+    db = SessionLocal()
+    try:
+        fold_pending(db)
+    finally:
+        db.close()
+
+
+def record_status_change(db: Session, order: Order, old_status: str, new_status: str):
+    if old_status != "cancelled" and new_status == "cancelled":
+        record_order(db, order, -1)
+    elif old_status == "cancelled" and new_status != "cancelled":
+        record_order(db, order, 1)
+
+
+def backfill(db: Session, batch_size: int = 5000) -> int:
+    """Rebuild every rollup from the orders table and the order archive. Returns the number of orders processed."""
+    db.execute(delete(OrderRollup))
+    db.execute(delete(ProductSalesDaily))
+    # Queued orders are counted below from their current status
+    db.execute(delete(PendingRollup))
+
+    processed = 0
+    last_id = 0
+    while True:
+        orders = db.query(Order.id, Order.created_at).filter(
+            Order.id > last_id,
+            Order.status != "cancelled"
+        ).order_by(Order.id).limit(batch_size).all()
+        if not orders:
+            break
+        lines = _lines_by_order(db, [o.id for o in orders])
+        _apply(db, ((o.created_at, lines[o.id]) for o in orders), 1)
+        processed += len(orders)
+        last_id = orders[-1].id
+
+    # Orders moved to cold storage carry their lines in the archive payload
+    for batch in archive.iter_archived(db, batch_size):
+        kept = [order for order in batch if order["status"] != "cancelled"]
+        _apply(db, (
+            (
+                order["created_at"],
+                [(item["product_id"], item.get("category_id"), item["quantity"], item["price"]) for item in order["items"]],
+            )
+            for order in kept
+        ), 1)
+        processed += len(kept)
+    db.commit()
+    return processed
+
+
+def since(days: int, granularity: str = "day") -> datetime:
+    return bucket_start(datetime.utcnow() - timedelta(days=days), granularity)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python -m app.analytics backfill")
+        sys.exit(1)
+    sync_schema(engine)
+    session = SessionLocal()
+    try:
+        print(f"✅ Backfilled analytics from {backfill(session)} orders")
+    finally:
+        session.close()
@@ -0,0 +1,158 @@
+"""
+Cold storage for finished orders.
+
+Delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved
+out of orders/order_items into order_archive, one row per order. Each row
+keeps the filterable columns plus a zlib-compressed JSON payload holding the
+rest of the order and its items, with product name/image/category as they
+were at archive time. On Postgres the archive is partitioned by month of
+created_at, so old months can be detached or moved to cheaper storage
+without touching the rest.
+
+This keeps the hot tables and their indexes limited to recent and
+in-flight orders. Archived orders are still readable through the
+/api/orders/archive and /api/admin/orders/archive endpoints, which
+decompress each row on the fly. Analytics backfills read them too
+(see analytics.backfill). The co-purchase recommendations only see live
+orders.
+
+Usage: python -m app.archive [days]
+"""
+import json
+import sys
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session, selectinload
+from .config import settings
+from .database import SessionLocal, engine
+from .models import Order, OrderItem, OrderArchive
+from .migrations import sync_schema
+
+ARCHIVABLE_STATUSES = ("delivered", "cancelled")
+BATCH_SIZE = 500
+
+
+def _month(value: datetime) -> date:
+    """First day of `value`'s month in UTC, the time zone partition bounds are written in"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def ensure_partitions(db: Session, months: Iterable[date]):
+    """Create the monthly order_archive partitions rows are about to land in (Postgres only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for month in sorted(set(months)):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS order_archive_{month:%Y_%m} PARTITION OF order_archive "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_next_month(month).isoformat()} 00:00:00+00')"
+        ))
+
+
+def pack(order: Order) -> bytes:
+    return zlib.compress(json.dumps({
+        "shipping_address": order.shipping_address,
+        "payment_method": order.payment_method,
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+        "items": [
+            {
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price": item.price,
+                "name": item.product.name if item.product else None,
+                "image": item.product.image if item.product else None,
+                "category_id": item.product.category_id if item.product else None,
+            }
+            for item in order.items
+        ],
+    }, separators=(",", ":")).encode())
+
+
+def unpack(row: OrderArchive) -> dict:
+    """Archived order as a dict matching schemas.ArchivedOrder"""
+    payload = json.loads(zlib.decompress(row.payload))
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "status": row.status,
+        "payment_status": row.payment_status,
+        "total_amount": row.total_amount,
+        "created_at": row.created_at,
+        "archived_at": row.archived_at,
+        **payload,
+    }
+
+
+def archive_orders(db: Session, older_than_days: int, batch_size: int = BATCH_SIZE) -> int:
+    """Move finished orders created more than `older_than_days` ago into order_archive. Returns how many moved."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        # Rows locked by an in-flight status change are skipped and picked up next run
+        orders = db.query(Order).options(
+            selectinload(Order.items).joinedload(OrderItem.product)
+        ).filter(
+            Order.status.in_(ARCHIVABLE_STATUSES),
+            Order.created_at < cutoff
+        ).order_by(Order.id).limit(batch_size).with_for_update(of=Order, skip_locked=True).all()
+        if not orders:
+            break
+
+        ensure_partitions(db, (_month(order.created_at) for order in orders))
+        db.execute(insert(OrderArchive), [
+            {
+                "id": order.id,
+                "created_at": order.created_at,
+                "user_id": order.user_id,
+                "status": order.status,
+                "payment_status": order.payment_status,
+                "total_amount": order.total_amount,
+                "payload": pack(order),
+            }
+            for order in orders
+        ])
+        order_ids = [order.id for order in orders]
+        db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        moved += len(orders)
+    return moved
+
+
+def iter_archived(db: Session, batch_size: int = 5000) -> Iterator[List[dict]]:
+    """Every archived order, unpacked, in batches of `batch_size`"""
+    last_id = 0
+    while True:
+        rows = db.query(OrderArchive).filter(OrderArchive.id > last_id).order_by(OrderArchive.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield [unpack(row) for row in rows]
+        last_id = rows[-1].id
+
+
+def archive_job():
+    db = SessionLocal()
+    try:
+        moved = archive_orders(db, settings.order_archive_after_days)
+        if moved:
+            print(f"Archived {moved} orders")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else settings.order_archive_after_days
+    sync_schema(engine)
+    session = SessionLocal()
+    try:
+        print(f"✅ Archived {archive_orders(session, days)} orders older than {days} days")
+    finally:
+        session.close()
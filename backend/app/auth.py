@@ -1,18 +1,23 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy.orm import Session, make_transient_to_detached
+from .database import get_db, SessionLocal
 from .models import User
 from .config import settings
+from .cache import cache
 
 # Use bcrypt with explicit rounds for better compatibility
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Not kept in the users cache
+UNCACHED_USER_COLUMNS = {"hashed_password"}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -43,10 +48,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    def load_user():
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            raise credentials_exception
+        return {column.key: getattr(user, column.key) for column in User.__table__.columns if column.key not in UNCACHED_USER_COLUMNS}
+    
+    # Attach the cached row to this session without a SELECT; uncached columns load on access
+    user = User(**cache.get_or_set("users", email, load_user))
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
 
 def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_admin:
@@ -55,3 +66,32 @@ def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
             detail="Not enough permissions"
         )
     return current_user
+
+# Single-use tickets for clients that must put credentials in the URL (EventSource).
+# They carry no "sub", so they are never accepted as access tokens.
+STREAM_TICKET_TTL = 30
+
+def create_stream_ticket(scope: str) -> str:
+    return create_access_token({"scope": scope, "jti": uuid.uuid4().hex}, timedelta(seconds=STREAM_TICKET_TTL))
+
+def redeem_stream_ticket(ticket: str, scope: str) -> None:
+    """Accept a ticket from create_stream_ticket once; raises 401 if it is invalid, expired or used"""
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired stream ticket")
+    try:
+        payload = jwt.decode(ticket, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        raise invalid
+    if payload.get("scope") != scope or not payload.get("jti"):
+        raise invalid
+    # Recorded in the cache backend, which is shared between workers when it is Redis
+    # (SET NX there), so only the first of concurrent redemptions succeeds
+    if not cache.backend.add(f"stream-ticket:{payload['jti']}", b"1", STREAM_TICKET_TTL):
+        raise invalid
+
+def authenticate_admin(token: str) -> None:
+    """Admin check outside of a request's dependencies, using a short-lived session"""
+    db = SessionLocal()
+    try:
+        get_current_admin(get_current_user(token, db))
+    finally:
+        db.close()
@@ -0,0 +1,121 @@
+"""
+Circuit breaker in front of the database connection pool.
+
+When the database goes away, every request would otherwise wait up to
+pool_timeout (30s) for a connection that never comes, tying up worker
+threads and piling more checkouts onto the dead pool. Instead:
+
+- After DB_BREAKER_THRESHOLD consecutive connection failures (failed or
+  timed-out checkouts, disconnects mid-query) the breaker opens.
+- While open, checkouts raise `DatabaseUnavailable` immediately; the app
+  answers 503 with Retry-After, and the catalog falls back to stale data
+  (see stale.py).
+- Every DB_BREAKER_RESET_SECONDS one checkout is let through as a probe.
+  The first statement that succeeds closes the breaker again.
+
+Errors raised by the SQL itself (constraint violations and the like) don't
+count; only failures to reach the database do.
+"""
+import threading
+import time
+from sqlalchemy import event, exc
+from .config import settings
+from .metrics import registry, Counter, Gauge, TimedQueuePool
+
+breaker_transitions = registry.register(Counter(
+    "db_circuit_transitions_total", "Database circuit breaker state changes", ("state",)))
+breaker_rejected = registry.register(Counter(
+    "db_circuit_rejected_total", "Connection checkouts refused while the database circuit was open"))
+
+
+class DatabaseUnavailable(Exception):
+    """Raised instead of waiting on the pool while the database circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int, reset_timeout: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """True if a call may go ahead: the circuit is closed, or it is time for a probe"""
+        if self.opened_at is None:
+            return True
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # One probe per reset period; the rest keep failing fast until it succeeds
+            self.opened_at = now
+            return True
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        # Checked without the lock first: this runs after every statement
+        if self.failures == 0 and self.opened_at is None:
+            return
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"Circuit breaker '{self.name}' closed")
+                breaker_transitions.inc("closed")
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures >= self.threshold:
+                print(f"Circuit breaker '{self.name}' opened after {self.failures} failures")
+                breaker_transitions.inc("open")
+                self.opened_at = time.monotonic()
+            elif self.opened_at is not None:
+                # Failed probe: wait a full period before the next one
+                self.opened_at = time.monotonic()
+
+
+db_breaker = CircuitBreaker("database", settings.db_breaker_threshold, settings.db_breaker_reset_seconds)
+
+registry.register(Gauge("db_circuit_open", "1 while the database circuit breaker is open", lambda: int(db_breaker.is_open)))
+
+
+class GuardedQueuePool(TimedQueuePool):
+    """Pool that refuses checkouts while `db_breaker` is open"""
+
+    def connect(self):
+        if not db_breaker.allow():
+            breaker_rejected.inc()
+            raise DatabaseUnavailable("Database circuit breaker is open")
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            # Pool exhausted; connect errors themselves are counted by handle_error below
+            db_breaker.record_failure()
+            raise
+
+
+def instrument_breaker(engine):
+    """Feed statement outcomes on `engine` to `db_breaker`"""
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        db_breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # Lost connections, and failures to connect at all (which have no Connection yet).
+        # Other OperationalErrors (deadlocks, lock and statement timeouts) are query errors.
+        if context.is_disconnect or context.connection is None:
+            db_breaker.record_failure()
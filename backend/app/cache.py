@@ -0,0 +1,468 @@
+"""
+Two-tier cache shared across workers.
+
+Reads go to a process-local LRU first, then to the shared backend (Redis,
+or an in-process fake when CACHE_BACKEND=memory), then to the loader.
+Entries live in namespaces ("catalog", "users") that carry a version
+number in the shared backend:
+
+- `invalidate(ns)` bumps the version, so every entry written under the old
+  version is unreachable at once, including ones a concurrent reader is
+  still about to write.
+- `invalidate(ns, key)` drops a single entry (used for stock changes,
+  where a brief stale read is harmless). The time is noted per key, and a
+  loader that started before it doesn't write its (old) value back.
+
+Invalidations are applied after the database transaction commits and
+broadcast to the other workers with Postgres NOTIFY (when running on
+Postgres), whose listener drops its local copies within milliseconds. All of
+a transaction's invalidations go out in one NOTIFY sent on its own
+connection just before it commits; Postgres delivers it only if the commit
+succeeds.
+Each worker checks the namespace version it last saw before trusting a
+local entry.
+"""
+import json
+import os
+import pickle
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import engine
+from .metrics import registry, Counter
+
+CHANNEL = "cache_invalidation"
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD = 7900
+
+# How long single-key invalidation times are kept; longer than any loader runs
+KEY_INVALIDATION_WINDOW = 60
+
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by namespace and tier that answered", ("namespace", "result")))
+
+
+class LocalLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: Hashable, version: int) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return False, None
+            expires_at, entry_version, value = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[(namespace, key)]
+                return False, None
+            self._entries.move_to_end((namespace, key))
+            return True, value
+
+    def set(self, namespace: str, key: Hashable, version: int, value: Any, ttl: float):
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic() + ttl, version, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: Hashable):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared backends
+class MemoryBackend:
+    """In-process stand-in for Redis, for single-worker setups and tests"""
+
+    shared = False
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl, value)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set `key` only if it is absent; True if it was set"""
+        with self._lock:
+            entry = self._values.get(key)
+            now = time.monotonic()
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                return False
+            self._values[key] = (now + ttl, value)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._values.get(key, (None, b"0"))[1]) + 1
+            self._values[key] = (None, str(value).encode())
+            return value
+
+
+class RedisBackend:
+    shared = True
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._redis.set(key, value, ex=max(1, int(ttl)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self._redis.set(key, value, ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+    def incr(self, key: str) -> int:
+        return self._redis.incr(key)
+
+
+# Invalidation broadcast
+class PostgresNotifier:
+    """Publishes invalidations with NOTIFY and delivers other workers' ones to `handler`"""
+
+    def __init__(self, handler: Callable[[dict], None]):
+        self.handler = handler
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def publish(self, message: dict):
+        with engine.connect() as conn:
+            self._notify(conn, json.dumps(message))
+            conn.commit()
+
+    def publish_batch(self, session: Session, origin: str, messages: List[dict]):
+        """Queue `messages` on `session`'s transaction, in as few NOTIFYs as fit the payload limit"""
+        # Its own connection: no extra pool checkout, and delivered only if it commits
+        conn = session.connection()
+        empty = len(self._batch_payload(origin, []))
+        batch: List[str] = []
+        size = empty
+        for message in map(json.dumps, messages):
+            if batch and size + len(message) + 1 > MAX_PAYLOAD:
+                self._notify(conn, self._batch_payload(origin, batch))
+                batch, size = [], empty
+            batch.append(message)
+            size += len(message) + 1
+        if batch:
+            self._notify(conn, self._batch_payload(origin, batch))
+
+    def _batch_payload(self, origin: str, messages: List[str]) -> str:
+        return f'{{"origin": {json.dumps(origin)}, "batch": [{",".join(messages)}]}}'
+
+    def _notify(self, conn, payload: str):
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+        conn = psycopg2.connect(engine.url.set(drivername="postgresql").render_as_string(hide_password=False))
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            # Anything published while we were disconnected was missed
+            self.handler({"reset": True})
+            while not self._stopping.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self.handler(json.loads(conn.notifies.pop(0).payload))
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                self._stopping.wait(1.0)
+
+
+class LocalNotifier:
+    """Single process: invalidations are already applied where they happen"""
+
+    def publish(self, message: dict):
+        pass
+
+    def publish_batch(self, session: Session, origin: str, messages: List[dict]):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Cache:
+    def __init__(self, backend, local_max_entries: int = 10_000, ttl: float = 300, broadcast: bool = False):
+        self.backend = backend
+        self.ttl = ttl
+        self.local = LocalLRU(local_max_entries)
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Namespace versions this worker has seen; dropped when another worker invalidates
+        self._versions: Dict[str, int] = {}
+        # (namespace, key) -> monotonic time of its last single-key invalidation
+        self._key_invalidated: Dict[Tuple[str, Hashable], float] = {}
+        self._key_lock = threading.Lock()
+        # Handlers for non-cache messages from other workers, see broadcast()
+        self._listeners: List[Callable[[dict], None]] = []
+        # Called with (namespace, key) for single-key invalidations, here or on other workers
+        self._key_invalidation_listeners: List[Callable[[str, Hashable], None]] = []
+        self.notifier = PostgresNotifier(self._on_message) if broadcast else LocalNotifier()
+
+    def _shared_key(self, namespace: str, version: int, key: Hashable) -> str:
+        return f"cache:{namespace}:{version}:{key}"
+
+    def _version(self, namespace: str) -> int:
+        version = self._versions.get(namespace)
+        if version is None:
+            try:
+                version = int(self.backend.get(f"cache-version:{namespace}") or 0)
+            except Exception as e:
+                print(f"Cache backend unavailable: {e}")
+                return -1
+            self._versions[namespace] = version
+        return version
+
+    def version(self, namespace: str) -> int:
+        """Current version of `namespace`, or -1 when the backend can't be reached"""
+        return self._version(namespace)
+
+    def lookup(self, namespace: str, key: Hashable, ttl: Optional[float] = None) -> Tuple[bool, Any]:
+        """(True, value) if `key` is cached, else (False, None). Shared hits are kept locally for `ttl`."""
+        version = self._version(namespace)
+        if version < 0:
+            return False, None
+
+        hit, value = self.local.get(namespace, key, version)
+        if hit:
+            cache_requests.inc(namespace, "local")
+            return True, value
+
+        try:
+            raw = self.backend.get(self._shared_key(namespace, version, key))
+        except Exception as e:
+            print(f"Cache backend unavailable: {e}")
+            raw = None
+        if raw is None:
+            return False, None
+        value = pickle.loads(raw)
+        cache_requests.inc(namespace, "shared")
+        self.local.set(namespace, key, version, value, ttl or self.ttl)
+        return True, value
+
+    def on_key_invalidated(self, handler: Callable[[str, Hashable], None]):
+        self._key_invalidation_listeners.append(handler)
+
+    def _mark_invalidated(self, namespace: str, key: Hashable):
+        for handler in self._key_invalidation_listeners:
+            handler(namespace, key)
+        now = time.monotonic()
+        with self._key_lock:
+            self._key_invalidated[(namespace, key)] = now
+            if len(self._key_invalidated) > 1000:
+                self._key_invalidated = {
+                    k: at for k, at in self._key_invalidated.items() if now - at < KEY_INVALIDATION_WINDOW
+                }
+
+    def invalidated_since(self, namespace: str, key: Hashable, since: float) -> bool:
+        """True if `key` was invalidated on its own at or after monotonic time `since`"""
+        return self._key_invalidated.get((namespace, key), float("-inf")) >= since
+
+    def store(
+        self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None,
+        version: Optional[int] = None, loaded_since: Optional[float] = None
+    ):
+        """
+        Cache `value` under `version` (default: the current one), so a value loaded before a namespace
+        invalidation stays unreachable. Pass the monotonic time the load started as `loaded_since`
+        to also skip values that a single-key invalidation made stale.
+        """
+        ttl = ttl or self.ttl
+        version = self._version(namespace) if version is None else version
+        if version < 0:
+            return
+        if loaded_since is not None and self.invalidated_since(namespace, key, loaded_since):
+            return
+        try:
+            self.backend.set(self._shared_key(namespace, version, key), pickle.dumps(value), ttl)
+        except Exception as e:
+            print(f"Cache backend unavailable: {e}")
+        self.local.set(namespace, key, version, value, ttl)
+
+    def get_or_set(self, namespace: str, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for `key`, calling `loader` on a miss. `loader` exceptions are not cached."""
+        version = self._version(namespace)
+        if version < 0:
+            cache_requests.inc(namespace, "unavailable")
+            return loader()
+
+        hit, value = self.lookup(namespace, key, ttl)
+        if hit:
+            return value
+        started = time.monotonic()
+        value = loader()
+        cache_requests.inc(namespace, "miss")
+        self.store(namespace, key, value, ttl, version, loaded_since=started)
+        return value
+
+    def invalidate(self, namespace: str, key: Optional[Hashable] = None):
+        """Drop one key, or the whole namespace, here, in the shared backend and on other workers"""
+        self._invalidate_here(namespace, key)
+        try:
+            self.notifier.publish({"origin": self.origin, "ns": namespace, "key": key})
+        except Exception as e:
+            print(f"Cache invalidation broadcast failed: {e}")
+
+    def _invalidate_here(self, namespace: str, key: Optional[Hashable]):
+        try:
+            if key is None:
+                self._versions[namespace] = self.backend.incr(f"cache-version:{namespace}")
+            else:
+                self._mark_invalidated(namespace, key)
+                self.local.delete(namespace, key)
+                self.backend.delete(self._shared_key(namespace, self._version(namespace), key))
+        except Exception as e:
+            print(f"Cache backend unavailable: {e}")
+            self._versions.pop(namespace, None)
+
+    def invalidate_on_commit(self, db: Session, namespace: str, *keys: Hashable):
+        """Invalidate once `db` commits (nothing happens on rollback). No keys means the whole namespace."""
+        for key in keys or (None,):
+            self._on_commit(db, {"ns": namespace, "key": key}, lambda ns=namespace, key=key: self._invalidate_here(ns, key))
+
+    def broadcast_on_commit(self, db: Session, message: dict, apply: Callable[[], None]):
+        """Call `apply` here and send `message` to the other workers once `db` commits"""
+        self._on_commit(db, message, apply)
+
+    def _on_commit(self, db: Session, message: dict, apply: Callable[[], None]):
+        # Tie the message to the current transaction, so a rollback drops it (begin() doesn't connect yet)
+        if not db.in_transaction():
+            db.begin()
+        pending = db.info.get("cache_pending")
+        if pending is None:
+            pending = db.info["cache_pending"] = []
+            event.listen(db, "before_commit", self._publish_pending)
+            event.listen(db, "after_commit", self._apply_pending)
+            event.listen(db, "after_soft_rollback", lambda session, transaction: session.info["cache_pending"].clear())
+        # e.g. one order with two lines of the same product
+        if all(queued != message for queued, _ in pending):
+            pending.append((message, apply))
+
+    def _publish_pending(self, session: Session):
+        messages = [message for message, _ in session.info["cache_pending"]]
+        if messages:
+            self.notifier.publish_batch(session, self.origin, messages)
+
+    def _apply_pending(self, session: Session):
+        pending = list(session.info["cache_pending"])
+        session.info["cache_pending"].clear()
+        for _, apply in pending:
+            apply()
+
+    def broadcast(self, message: dict):
+        """Send `message` to the listeners on every other worker (no-op without Postgres NOTIFY)"""
+        try:
+            self.notifier.publish({"origin": self.origin, **message})
+        except Exception as e:
+            print(f"Broadcast failed: {e}")
+
+    def add_listener(self, handler: Callable[[dict], None]):
+        self._listeners.append(handler)
+
+    def _on_message(self, message: dict):
+        if "batch" in message:
+            for item in message["batch"]:
+                self._on_message({"origin": message["origin"], **item})
+            return
+        if "ns" not in message and not message.get("reset"):
+            if message.get("origin") != self.origin:
+                for handler in self._listeners:
+                    handler(message)
+            return
+        if message.get("reset"):
+            self._versions.clear()
+            self.local.clear()
+            if not self.backend.shared:
+                self.backend = MemoryBackend()
+        elif message.get("origin") != self.origin:
+            namespace, key = message["ns"], message.get("key")
+            if key is None:
+                self._versions.pop(namespace, None)
+                if not self.backend.shared:
+                    # Each worker has its own fake backend, so bump its version too
+                    self.backend.incr(f"cache-version:{namespace}")
+            else:
+                self._mark_invalidated(namespace, key)
+                self.local.delete(namespace, key)
+                if not self.backend.shared:
+                    self.backend.delete(self._shared_key(namespace, self._version(namespace), key))
+
+    def start(self):
+        self.notifier.start()
+
+    def stop(self):
+        self.notifier.stop()
+
+
+def create_cache() -> Cache:
+    backend = RedisBackend(settings.redis_url) if settings.cache_backend == "redis" else MemoryBackend()
+    return Cache(
+        backend,
+        local_max_entries=settings.cache_local_max_entries,
+        ttl=settings.cache_ttl_seconds,
+        broadcast=engine.dialect.name == "postgresql" and settings.cache_broadcast
+    )
+
+
+cache = create_cache()
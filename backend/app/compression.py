@@ -0,0 +1,148 @@
+"""
+Response compression middleware with brotli/gzip negotiation.
+
+Brotli is used when the `brotli` package is installed and the client accepts
+it, otherwise gzip. Bodies smaller than `minimum_size`, already encoded
+responses and event streams are passed through untouched.
+"""
+import gzip
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+SKIP_CONTENT_TYPES = (b"text/event-stream", b"image/", b"video/", b"application/zip")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def negotiate(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accepted = parse_accept_encoding(value.decode("latin-1"))
+                if brotli is not None and accepted.get("br", 0) > 0:
+                    return "br"
+                if accepted.get("gzip", 0) > 0:
+                    return "gzip"
+                return None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = next((v for k, v in headers if k == b"content-type"), b"")
+                if any(k == b"content-encoding" for k, _ in headers) or content_type.startswith(SKIP_CONTENT_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None and not more_body:
+                # Whole body in one message: compress it in one go if it's worth it
+                headers = start_message.get("headers", [])
+                if len(body) < self.minimum_size:
+                    await send(start_message)
+                    await send(message)
+                else:
+                    body = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                    start_message["headers"] = self._encoded_headers(headers, encoding, len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                start_message = None
+                return
+
+            if start_message is not None:
+                # Streaming response: compress chunk by chunk
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                start_message["headers"] = self._encoded_headers(start_message.get("headers", []), encoding, None)
+                await send(start_message)
+                start_message = None
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _encoded_headers(headers: List[Tuple[bytes, bytes]], encoding: str, length: Optional[int]):
+        vary = b", ".join([v for k, v in headers if k == b"vary"] + [b"Accept-Encoding"])
+        headers = [(k, v) for k, v in headers if k not in (b"content-length", b"vary")]
+        headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"vary", vary))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
@@ -8,11 +8,89 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Connection pool: warmed at startup. The keepalive job (seconds, 0 disables) replaces
+    # pre-ping on every checkout, but its pings also keep Neon's compute from ever suspending
+    # (billed as always-on), so it is opt-in; enable it together with DB_POOL_PRE_PING=false.
+    db_pool_prewarm: int = 5
+    db_keepalive_interval: int = 0
+    db_pool_recycle: int = 3600
+    db_pool_pre_ping: bool = True
+    
+    # Database circuit breaker: fail fast after this many consecutive connection
+    # failures, probing again every reset period (see breaker.py)
+    db_breaker_threshold: int = 5
+    db_breaker_reset_seconds: float = 5
+    
     # Twilio Settings
     twilio_account_sid: Optional[str] = None
     twilio_auth_token: Optional[str] = None
     twilio_phone_number: Optional[str] = None
     
+    # Outbound Notification Settings
+    sms_provider: str = "twilio"  # twilio, fake
+    sms_max_concurrency: int = 4
+    notification_workers: int = 2
+    notification_max_attempts: int = 5
+    notification_retry_backoff: float = 2.0  # seconds, doubled on each retry
+    
+    # OTP Settings
+    otp_store: str = "database"  # database, memory (single worker only), redis
+    otp_ttl_seconds: int = 300
+    otp_max_attempts: int = 5
+    otp_sweep_interval: int = 300  # seconds, 0 disables the sweeper
+    
+    # Shared store for multi-worker deployments
+    redis_url: Optional[str] = None
+    
+    # Rate Limiting (token buckets per IP and per user, see rate_limit.ROUTE_COSTS)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # memory, redis
+    rate_limit_capacity: float = 100
+    rate_limit_refill_per_second: float = 5
+    
+    # Idempotency-Key replay store (see idempotency.IDEMPOTENT_ROUTES)
+    idempotency_backend: str = "memory"  # memory (single worker only), redis
+    idempotency_ttl_seconds: int = 86400
+    idempotency_max_entries: int = 10000
+    
+    # Two-tier cache: local LRU + shared backend, invalidated via Postgres NOTIFY
+    cache_backend: str = "memory"  # memory (per worker), redis
+    cache_ttl_seconds: int = 300
+    catalog_list_cache_ttl_seconds: int = 30
+    cache_local_max_entries: int = 10000
+    cache_broadcast: bool = True
+    # Serve the last good catalog response up to this long after it expired, refreshing in the background (0 disables)
+    catalog_stale_seconds: int = 600
+    catalog_stale_max_entries: int = 5000
+    
+    # Responses smaller than this are sent uncompressed
+    compression_minimum_size: int = 1024
+    
+    # Bearer token required by /metrics when set
+    metrics_token: Optional[str] = None
+    
+    # Request profiling: admins send X-Profile: 1; a sample rate also profiles random requests
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 5
+    profile_max_stored: int = 50
+    
+    # Delivered/cancelled orders older than this move to the compressed order archive
+    order_archive_after_days: int = 365
+    order_archive_interval: int = 86400  # seconds, 0 disables the archive job
+    
+    # Rebuild interval for "frequently bought together" (seconds, 0 disables)
+    recommendations_rebuild_interval: int = 3600
+    
+    # Trending ranking: a sale's weight halves every half-life (days); recompute interval in seconds, 0 disables
+    popularity_half_life_days: float = 7
+    popularity_refresh_interval: int = 3600
+    
+    # How often product ratings are recomputed from reviews to correct drift (seconds, 0 disables)
+    rating_reconcile_interval: int = 86400
+    
+    # How often queued order totals are folded into the analytics rollups (seconds)
+    analytics_rollup_interval: int = 15
+    
     # Cloudinary Settings
     cloudinary_cloud_name: Optional[str] = None
     cloudinary_api_key: Optional[str] = None
@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine
+import functools
+import inspect
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
+from .metrics import instrument_engine, session_reacquired
+from .breaker import GuardedQueuePool, instrument_breaker
 
 database_url = settings.database_url
 
@@ -13,14 +17,60 @@ if database_url.startswith("postgres://"):
 # Configure engine with connection pool settings for Neon (serverless Postgres)
 engine = create_engine(
     database_url,
-    poolclass=QueuePool,
+    poolclass=GuardedQueuePool,
     pool_size=5,
     max_overflow=10,
     pool_timeout=30,
-    pool_recycle=300,  # Recycle connections every 5 minutes
-    pool_pre_ping=True,  # Test connections before using them
+    pool_recycle=settings.db_pool_recycle,
+    # Off when the keepalive job (see pool.py) checks idle connections instead
+    pool_pre_ping=settings.db_pool_pre_ping,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
+instrument_breaker(engine)
+
+
+class LazySession(Session):
+    """
+    Session that only checks out a connection on its first statement (as all
+    sessions do) and can hand it back mid-request with `release()`.
+    """
+
+    released = False
+    # Set by a flush, cleared when the transaction ends: flushed writes are never committed by release()
+    wrote = False
+
+    def release(self):
+        """End a read-only transaction, returning the connection but keeping loaded objects usable"""
+        if not self.in_transaction() or self.wrote or self.new or self.dirty or self.deleted:
+            return
+        expire_on_commit, self.expire_on_commit = self.expire_on_commit, False
+        try:
+            self.commit()
+        finally:
+            self.expire_on_commit = expire_on_commit
+        self.released = True
+
+
+@event.listens_for(LazySession, "after_begin")
+def _count_reacquire(session, transaction, connection):
+    # A lazy load or query after release(): the route should load that data up front
+    if session.released:
+        session.released = False
+        session_reacquired.inc()
+
+
+@event.listens_for(LazySession, "after_flush")
+def _mark_written(session, flush_context):
+    session.wrote = True
+
+
+@event.listens_for(LazySession, "after_commit")
+@event.listens_for(LazySession, "after_rollback")
+def _clear_written(session):
+    session.wrote = False
+
+
+SessionLocal = sessionmaker(class_=LazySession, autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 def get_db():
@@ -29,3 +79,36 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def release_sessions(endpoint):
+    """Wrap `endpoint` so the sessions it was given are released as soon as it returns"""
+    def release(kwargs):
+        for value in kwargs.values():
+            if isinstance(value, LazySession):
+                value.release()
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            release(kwargs)
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            release(kwargs)
+            return result
+    return wrapper
+
+
+class ReleasingRoute(APIRoute):
+    """
+    Route whose `get_db` session goes back to the pool when the endpoint
+    returns, before FastAPI validates and serializes the response (which can
+    take longer than the queries did). Use as `APIRouter(route_class=...)`.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, release_sessions(endpoint), **kwargs)
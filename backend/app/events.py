@@ -0,0 +1,85 @@
+"""
+In-process event broker for live admin feeds.
+
+Endpoints publish events when their transaction commits; every connected
+subscriber (one per open SSE stream) gets its own bounded queue. Events are
+also broadcast over the cache's Postgres NOTIFY channel so streams attached
+to other workers see them too.
+"""
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+from sqlalchemy.orm import Session
+from .cache import cache
+from .metrics import registry, Gauge
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queued: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(max_queued)
+        # Set when events were dropped because the client fell behind
+        self.lagged = False
+
+    def _put(self, message: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    def deliver(self, message: Dict[str, Any]):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def deliver(self, message: Dict[str, Any]):
+        """Fan a message out to this worker's subscribers"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(subscription)
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        message = {"event": event_type, "data": data, "at": datetime.utcnow().isoformat()}
+        self.deliver(message)
+        cache.broadcast(message)
+
+    def publish_on_commit(self, db: Session, event_type: str, data: Dict[str, Any]):
+        """Publish once `db` commits, in its cache invalidation NOTIFY; nothing is sent if it rolls back"""
+        message = {"event": event_type, "data": data, "at": datetime.utcnow().isoformat()}
+        cache.broadcast_on_commit(db, message, lambda: self.deliver(message))
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+broker = EventBroker()
+cache.add_listener(lambda message: broker.deliver(message) if "event" in message else None)
+
+registry.register(Gauge("event_stream_subscribers", "Open admin event streams on this worker", broker.subscriber_count))
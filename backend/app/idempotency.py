@@ -0,0 +1,214 @@
+"""
+Idempotency-Key support for retried mutating requests.
+
+A client that sends `Idempotency-Key: <unique value>` on one of the
+IDEMPOTENT_ROUTES gets the first response stored for that key (scoped to
+the caller and route) and every retry with the same key is answered from
+the store without running the endpoint again. A retry that arrives while
+the first request is still running gets 409, and reusing a key with a
+different request body gets 422.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from .config import settings
+from .metrics import registry, Counter
+from .rate_limit import RateLimitMiddleware
+
+IDEMPOTENT_ROUTES = {
+    ("POST", "/api/orders"),
+    ("POST", "/api/cart"),
+    ("POST", "/api/upload/image"),
+}
+
+MAX_KEY_LENGTH = 255
+# Larger responses are passed through but not stored
+MAX_STORED_BODY = 256 * 1024
+# A pending marker outlives a crashed worker for at most this long
+IN_PROGRESS_TTL = 60
+
+# Responses that depend on something the client can fix before retrying are not stored
+UNSTORED_STATUSES = {401, 403, 409, 429}
+
+NEW, PENDING, DONE = "new", "pending", "done"
+
+idempotent_requests = registry.register(Counter(
+    "idempotent_requests_total", "Requests carrying an Idempotency-Key by outcome", ("outcome",)))
+
+
+class MemoryStore:
+    """Process-local store. Oldest keys are dropped beyond `max_entries`."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def begin(self, key: str) -> Tuple[str, Optional[dict]]:
+        """Claim `key` for a new request, or return the stored/pending state"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return (DONE, entry[1]) if entry[1] is not None else (PENDING, None)
+            self._entries[key] = (now + IN_PROGRESS_TTL, None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return NEW, None
+
+    async def complete(self, key: str, record: dict, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, record)
+
+    async def release(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisStore:
+    """Store shared by all workers. Keys expire on their own."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.Redis.from_url(url)
+
+    async def begin(self, key: str) -> Tuple[str, Optional[dict]]:
+        name = f"idempotency:{key}"
+        if await self._redis.set(name, b"", nx=True, ex=IN_PROGRESS_TTL):
+            return NEW, None
+        value = await self._redis.get(name)
+        if not value:
+            return PENDING, None
+        return DONE, json.loads(value)
+
+    async def complete(self, key: str, record: dict, ttl: int):
+        await self._redis.set(f"idempotency:{key}", json.dumps(record), ex=ttl)
+
+    async def release(self, key: str):
+        await self._redis.delete(f"idempotency:{key}")
+
+
+def create_store():
+    if settings.idempotency_backend == "redis":
+        return RedisStore(settings.redis_url)
+    return MemoryStore(settings.idempotency_max_entries)
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, store=None, ttl: Optional[int] = None):
+        self.app = app
+        self.store = store or create_store()
+        self.ttl = ttl or settings.idempotency_ttl_seconds
+
+    @staticmethod
+    def idempotency_key(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == b"idempotency-key":
+                return value.decode("latin-1").strip()
+        return None
+
+    @staticmethod
+    async def respond(send, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def error(self, send, status_code: int, detail: str, outcome: str):
+        idempotent_requests.inc(outcome)
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if status_code == 409:
+            headers.append((b"retry-after", b"1"))
+        await self.respond(send, status_code, headers, body)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"].rstrip("/") or "/"
+        key = self.idempotency_key(scope) if (scope["method"], path) in IDEMPOTENT_ROUTES else None
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await self.error(send, 400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters", "invalid")
+            return
+
+        store_key = f"{RateLimitMiddleware.client_key(scope)}:{scope['method']}:{path}:{key}"
+        state, record = await self.store.begin(store_key)
+
+        if state == PENDING:
+            await self.error(send, 409, "A request with this Idempotency-Key is still in progress", "in_progress")
+            return
+
+        if state == DONE:
+            # Drain the retried body so it can be checked against the original
+            digest = hashlib.sha256()
+            while True:
+                message = await receive()
+                digest.update(message.get("body", b""))
+                if not message.get("more_body") or message["type"] != "http.request":
+                    break
+            if digest.hexdigest() != record["fingerprint"]:
+                await self.error(send, 422, "Idempotency-Key was already used with a different request", "mismatch")
+                return
+            idempotent_requests.inc("replayed")
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+            headers.append((b"idempotent-replayed", b"true"))
+            await self.respond(send, record["status"], headers, record["body"].encode("latin-1"))
+            return
+
+        digest = hashlib.sha256()
+        body_complete = False
+
+        async def hashing_receive():
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request":
+                digest.update(message.get("body", b""))
+                if not message.get("more_body"):
+                    body_complete = True
+            return message
+
+        response = {"status": None, "headers": [], "chunks": [], "size": 0, "storable": True}
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body" and response["storable"]:
+                chunk = message.get("body", b"")
+                response["size"] += len(chunk)
+                if response["size"] > MAX_STORED_BODY:
+                    response["storable"] = False
+                    response["chunks"] = []
+                else:
+                    response["chunks"].append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+        except Exception:
+            await self.store.release(store_key)
+            raise
+
+        status = response["status"]
+        if (
+            status is None or status >= 500 or status in UNSTORED_STATUSES
+            or not response["storable"] or not body_complete
+        ):
+            await self.store.release(store_key)
+            idempotent_requests.inc("not_stored")
+            return
+
+        await self.store.complete(store_key, {
+            "fingerprint": digest.hexdigest(),
+            "status": status,
+            "headers": [(name.decode("latin-1"), value.decode("latin-1")) for name, value in response["headers"]],
+            # latin-1 round-trips arbitrary bytes through JSON for the Redis store
+            "body": b"".join(response["chunks"]).decode("latin-1"),
+        }, self.ttl)
+        idempotent_requests.inc("stored")
@@ -0,0 +1,64 @@
+"""
+Periodic background jobs started from the app lifespan.
+"""
+import threading
+import traceback
+from typing import Callable, List
+
+
+class PeriodicJob:
+    """Runs `func` every `interval` seconds on a daemon thread until stopped"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], object], run_immediately: bool = False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_immediately = run_immediately
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        try:
+            self.func()
+        except Exception:
+            print(f"Job {self.name} failed:")
+            traceback.print_exc()
+
+    def _run(self):
+        if self.run_immediately:
+            self.run_once()
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+
+class JobRegistry:
+    def __init__(self):
+        self.jobs: List[PeriodicJob] = []
+
+    def add(self, job: PeriodicJob) -> PeriodicJob:
+        self.jobs.append(job)
+        return job
+
+    def start(self):
+        for job in self.jobs:
+            job.start()
+
+    def stop(self):
+        for job in self.jobs:
+            job.stop()
+
+
+registry = JobRegistry()
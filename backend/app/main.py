@@ -1,17 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+import math
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routers import auth, products, categories, cart, wishlist, orders, admin, upload
+from .config import settings
+from .database import engine
+from .breaker import DatabaseUnavailable, db_breaker
+from .routers import auth, products, categories, cart, wishlist, orders, admin, upload, reviews, analytics, membership
+from . import notifications, otp_store, recommendations, ratings, pool, archive, popularity
+from . import analytics as rollups
+from .cache import cache
+from .jobs import registry as jobs, PeriodicJob
+from .migrations import sync_schema
+from .rate_limit import RateLimitMiddleware
+from .idempotency import IdempotencyMiddleware
+from .compression import CompressionMiddleware
+from .profiling import ProfilingMiddleware
+from .responses import ORJSONResponse
+from .metrics import MetricsMiddleware, registry as metrics_registry
+from starlette.responses import PlainTextResponse
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables and add any new columns/indexes
+sync_schema(engine)
+
+jobs.add(PeriodicJob("otp-sweeper", settings.otp_sweep_interval, otp_store.otp_store.sweep))
+jobs.add(PeriodicJob(
+    "recommendations", settings.recommendations_rebuild_interval, recommendations.rebuild, run_immediately=True
+))
+jobs.add(PeriodicJob("rating-reconcile", settings.rating_reconcile_interval, ratings.reconcile_job))
+jobs.add(PeriodicJob(
+    "popularity", settings.popularity_refresh_interval, popularity.refresh_job, run_immediately=True
+))
+jobs.add(PeriodicJob("order-archive", settings.order_archive_interval, archive.archive_job))
+jobs.add(PeriodicJob("analytics-rollups", settings.analytics_rollup_interval, rollups.fold_job))
+jobs.add(PeriodicJob("db-keepalive", settings.db_keepalive_interval, lambda: pool.keepalive(engine)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pooled connections before taking traffic
+    await asyncio.to_thread(pool.prewarm, engine, settings.db_pool_prewarm)
+    # Start background workers
+    notifications.dispatcher.start()
+    cache.start()
+    jobs.start()
+    yield
+    jobs.stop()
+    cache.stop()
+    notifications.dispatcher.stop()
 
 app = FastAPI(
     title="Daily Care Store API",
     description="Backend API for Daily Care Store",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+# Idempotency-Key replays - innermost so stored responses are uncompressed and retries are still rate limited
+app.add_middleware(IdempotencyMiddleware)
+
+# Opt-in profiling (X-Profile: 1 from an admin, or PROFILE_SAMPLE_RATE) - inside rate limiting, so
+# profile requests (which check the admin token) are limited first, and inside metrics, which collects its SQL
+app.add_middleware(
+    ProfilingMiddleware,
+    sample_rate=settings.profile_sample_rate,
+    interval=settings.profile_interval_ms / 1000
 )
 
+# Rate limiting - added before CORS so rejections still carry CORS headers
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware - Allow all origins
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +80,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli or gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Request metrics - outermost so latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable(request: Request, exc: DatabaseUnavailable):
+    """The database circuit breaker is open: fail fast rather than wait on the pool"""
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable, please retry shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(db_breaker.retry_after())))}
+    )
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(products.router)
@@ -30,6 +104,9 @@ app.include_router(wishlist.router)
 app.include_router(orders.router)
 app.include_router(admin.router)
 app.include_router(upload.router)
+app.include_router(reviews.router)
+app.include_router(analytics.router)
+app.include_router(membership.router)
 
 @app.get("/")
 def root():
@@ -38,3 +115,10 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint. Protected by METRICS_TOKEN when it is set."""
+    if settings.metrics_token and request.headers.get("authorization") != f"Bearer {settings.metrics_token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
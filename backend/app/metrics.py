@@ -0,0 +1,298 @@
+"""
+In-process metrics exposed in Prometheus text format on /metrics.
+
+Tracks per-route latency, SQL statements issued per request (via SQLAlchemy
+cursor events), connection pool checkout wait, cold/warm checkout latency,
+hold time and usage, threadpool occupancy and latency of calls to external
+services.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    """Gauge whose value is read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        super().__init__(name, help_text)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return self.header() + [f"{self.name} {value}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(label_values)
+            if data is None:
+                data = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        lines = self.header()
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+request_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements issued per request", ("route",), COUNT_BUCKETS))
+request_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", ("route",)))
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"))
+pool_checkout = registry.register(Histogram(
+    "db_pool_checkout_seconds", "Full connection checkout latency; cold checkouts opened a new connection", ("kind",)))
+pool_hold = registry.register(Histogram(
+    "db_pool_hold_seconds", "Time a connection stays checked out of the pool"))
+session_reacquired = registry.register(Counter(
+    "db_session_reacquired_total", "Sessions that checked out a connection again after release()"))
+external_latency = registry.register(Histogram(
+    "external_call_duration_seconds", "Latency of calls to external services", ("service", "outcome")))
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests shed by the rate limiter", ("status",)))
+
+
+# Per-request SQL accounting
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "queries")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # Set to a list by ProfilingMiddleware to record each statement
+        self.queries: Optional[list] = None
+
+
+# Threadpool workers run with a copy of the request context, so they see the same RequestStats object
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+# Set by the pool "connect" event while the current thread's checkout opens a new connection
+_checkout_state = threading.local()
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        elapsed = time.perf_counter() - started
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if stats.queries is not None:
+                stats.queries.append((started, elapsed, statement))
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        _checkout_state.cold = True
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            pool_hold.observe(time.perf_counter() - checked_out_at)
+
+    # engine.pool is looked up at scrape time because engine.dispose() replaces it
+    registry.register(Gauge("db_pool_size", "Configured pool size", lambda: engine.pool.size()))
+    registry.register(Gauge("db_pool_checked_out", "Connections currently checked out", lambda: engine.pool.checkedout()))
+    registry.register(Gauge("db_pool_overflow", "Connections open beyond pool_size", lambda: max(0, engine.pool.overflow())))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited, and took overall (cold or warm)"""
+
+    def connect(self):
+        _checkout_state.cold = False
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_checkout.observe(time.perf_counter() - start, "cold" if _checkout_state.cold else "warm")
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+def _threadpool_in_use() -> float:
+    import anyio.to_thread
+    return anyio.to_thread.current_default_thread_limiter().borrowed_tokens
+
+
+def _threadpool_capacity() -> float:
+    import anyio.to_thread
+    return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+
+registry.register(Gauge("threadpool_in_use", "Threadpool workers currently busy", _threadpool_in_use))
+registry.register(Gauge("threadpool_capacity", "Threadpool worker limit", _threadpool_capacity))
+
+
+@contextmanager
+def track_external(service: str):
+    """Time a call to an external service such as twilio, imgbb or cloudinary"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        external_latency.observe(time.perf_counter() - start, service, outcome)
+
+
+def route_name(scope) -> str:
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return getattr(endpoint, "__name__", "unknown")
+    # Unmatched paths are grouped together to keep label cardinality bounded
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            route = route_name(scope)
+            http_latency.observe(time.perf_counter() - start, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status_code))
+            request_db_statements.observe(stats.statements, route)
+            request_db_time.observe(stats.db_seconds, route)
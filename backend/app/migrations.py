@@ -0,0 +1,36 @@
+"""
+Keep an existing database in step with the models.
+
+`Base.metadata.create_all` only creates missing tables. This also adds
+columns and indexes that were introduced after a table was first created.
+New columns must be nullable or carry a server default.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from .database import Base
+
+
+def sync_schema(engine: Engine):
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                print(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn, checkfirst=True)
+                    print(f"Added index {index.name}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -15,6 +15,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     orders = relationship("Order", back_populates="user")
     cart_items = relationship("CartItem", back_populates="user")
@@ -45,12 +46,13 @@ class Product(Base):
     images = Column(JSON, default=[])
     category_id = Column(Integer, ForeignKey("categories.id"))
     product_type = Column(String)  # serum, cream, oil, tablet, scrub
-    rating = Column(Float, default=0)
+    rating = Column(Float, default=0)  # maintained from reviews, see routers/reviews.py
     reviews_count = Column(Integer, default=0)
     stock = Column(Integer, default=0)
     is_new = Column(Boolean, default=False)
     is_bestseller = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    popularity_score = Column(Float, default=0, server_default="0", nullable=False)  # decayed units/day, see popularity.py
     ingredients = Column(JSON, default=[])
     benefits = Column(JSON, default=[])
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -58,6 +60,33 @@ class Product(Base):
     
     category = relationship("Category", back_populates="products")
     order_items = relationship("OrderItem", back_populates="product")
+    reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_products_active_rating", "is_active", "rating"),
+        # Default (trending) catalog ordering
+        Index("ix_products_active_popularity", "is_active", "popularity_score", "created_at"),
+    )
+
+class Review(Base):
+    __tablename__ = "reviews"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    user_id = Column(Integer, ForeignKey("users.id"))
+    rating = Column(Integer)  # 1-5
+    title = Column(String, nullable=True)
+    comment = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    product = relationship("Product", back_populates="reviews")
+    user = relationship("User")
+    
+    __table_args__ = (
+        UniqueConstraint("product_id", "user_id", name="uq_reviews_product_user"),
+        Index("ix_reviews_product_created", "product_id", "created_at"),
+    )
 
 class Order(Base):
     __tablename__ = "orders"
@@ -74,12 +103,39 @@ class Order(Base):
     
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
+    
+    __table_args__ = (
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_updated_at", "updated_at"),
+    )
+
+class OrderArchive(Base):
+    """Delivered and cancelled orders moved out of orders/order_items by archive.py"""
+    __tablename__ = "order_archive"
+    
+    # The primary key includes the partition key, as Postgres requires
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String)
+    payment_status = Column(String)
+    total_amount = Column(Float)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    # zlib-compressed JSON of the remaining order columns and its items
+    payload = Column(LargeBinary)
+    
+    __table_args__ = (
+        Index("ix_order_archive_user_created", "user_id", "created_at"),
+        # One partition per month on Postgres, created by archive.ensure_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer)
     price = Column(Float)
@@ -97,6 +153,10 @@ class CartItem(Base):
     
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product")
+    
+    __table_args__ = (
+        Index("ix_cart_items_user_product", "user_id", "product_id"),
+    )
 
 class WishlistItem(Base):
     __tablename__ = "wishlist_items"
@@ -107,6 +167,10 @@ class WishlistItem(Base):
     
     user = relationship("User", back_populates="wishlist_items")
     product = relationship("Product")
+    
+    __table_args__ = (
+        Index("ix_wishlist_items_user_product", "user_id", "product_id"),
+    )
 
 
 class OTP(Base):
@@ -114,7 +178,74 @@ class OTP(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     phone = Column(String, index=True)
-    otp_code = Column(String)
+    otp_code = Column(String)  # HMAC digest of the code, see otp_store.hash_code
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True), index=True)
     is_used = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0, server_default="0")
+    
+    __table_args__ = (
+        Index("ix_otps_phone_is_used", "phone", "is_used"),
+    )
+
+
+class OrderRollup(Base):
+    """Order count and revenue per hour/day bucket (UTC), see analytics.py"""
+    __tablename__ = "order_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String)  # hour, day
+    bucket_start = Column(DateTime)
+    order_count = Column(Integer, default=0)
+    units = Column(Integer, default=0)
+    revenue = Column(Float, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", name="uq_order_rollups_bucket"),
+    )
+
+class ProductSalesDaily(Base):
+    """Units and revenue per product per day (UTC), see analytics.py"""
+    __tablename__ = "product_sales_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(DateTime)
+    product_id = Column(Integer, index=True)
+    category_id = Column(Integer, nullable=True)
+    order_count = Column(Integer, default=0)
+    units = Column(Integer, default=0)
+    revenue = Column(Float, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("day", "product_id", name="uq_product_sales_daily_day_product"),
+        Index("ix_product_sales_daily_day_category", "day", "category_id"),
+    )
+
+class PendingRollup(Base):
+    """An order to add to (sign=1) or remove from (sign=-1) the rollups, see analytics.fold_pending"""
+    __tablename__ = "pending_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer)
+    sign = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, default="sms")
+    provider = Column(String)
+    recipient = Column(String)
+    body = Column(Text)
+    status = Column(String, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_notifications_status_next_attempt", "status", "next_attempt_at"),
+    )
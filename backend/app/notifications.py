@@ -0,0 +1,245 @@
+"""
+Outbound notification queue.
+
+OTP SMS messages are written to the `notifications` table in the same
+transaction as the OTP itself and delivered by a pool of background workers,
+so request handlers never wait on the SMS provider.
+"""
+import random
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import SessionLocal
+from .metrics import track_external
+from .models import Notification
+
+
+# SMS Providers
+class SMSProvider(ABC):
+    """Base class for SMS providers. `send` raises on failure."""
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+
+    def is_configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    def send(self, recipient: str, body: str) -> Optional[str]:
+        """Deliver `body` to `recipient`, returning the provider's message id if it has one"""
+
+
+class TwilioProvider(SMSProvider):
+    name = "twilio"
+
+    def __init__(self, max_concurrency: int = 4):
+        super().__init__(max_concurrency)
+        self._client = None
+        self._lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return all([settings.twilio_account_sid, settings.twilio_auth_token, settings.twilio_phone_number])
+
+    def _get_client(self):
+        # The Twilio client keeps an HTTP session, so share one across workers
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
+            return self._client
+
+    def send(self, recipient: str, body: str) -> Optional[str]:
+        message = self._get_client().messages.create(
+            body=body,
+            from_=settings.twilio_phone_number,
+            to=recipient
+        )
+        return message.sid
+
+
+class FakeProvider(SMSProvider):
+    """In-memory provider for tests and load runs. Records every message instead of sending it."""
+    name = "fake"
+
+    def __init__(self, max_concurrency: int = 4):
+        super().__init__(max_concurrency)
+        self.sent: List[Tuple[str, str]] = []
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+    def send(self, recipient: str, body: str) -> Optional[str]:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise RuntimeError("Simulated provider failure")
+            self.sent.append((recipient, body))
+            return f"fake-{len(self.sent)}"
+
+
+PROVIDERS = {
+    TwilioProvider.name: TwilioProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+
+# Dispatcher
+class NotificationDispatcher:
+    """Pool of worker threads that deliver queued notifications with retries and backoff"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease_seconds: int = 60,
+        poll_interval: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.providers: Dict[str, SMSProvider] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._wakeup = threading.Condition()
+        self._pending_wakeups = 0
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def register(self, provider: SMSProvider):
+        self.providers[provider.name] = provider
+        self._semaphores[provider.name] = threading.BoundedSemaphore(provider.max_concurrency)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"notification-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Tell idle workers that new notifications were committed"""
+        with self._wakeup:
+            self._pending_wakeups += 1
+            self._wakeup.notify()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.retry_backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delivered = self.process_next()
+            except Exception:
+                traceback.print_exc()
+                delivered = False
+            if not delivered:
+                with self._wakeup:
+                    if self._pending_wakeups == 0 and not self._stopping.is_set():
+                        self._wakeup.wait(self.poll_interval)
+                    self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def _claim(self, db: Session) -> Optional[Notification]:
+        # Leased rows whose worker died become claimable again once the lease expires
+        now = datetime.utcnow()
+        notification = db.query(Notification).filter(
+            Notification.status.in_(["pending", "sending"]),
+            or_(Notification.next_attempt_at == None, Notification.next_attempt_at <= now)
+        ).order_by(Notification.id).with_for_update(skip_locked=True).first()
+        if not notification:
+            db.rollback()
+            return None
+
+        notification.status = "sending"
+        notification.attempts += 1
+        notification.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+        db.commit()
+        return notification
+
+    def process_next(self) -> bool:
+        """Claim and deliver one due notification. Returns False when the queue is idle."""
+        db = self.session_factory()
+        try:
+            notification = self._claim(db)
+            if not notification:
+                return False
+
+            provider = self.providers.get(notification.provider)
+            error = None
+            sid = None
+            if provider is None:
+                error = f"Unknown provider: {notification.provider}"
+            else:
+                try:
+                    with self._semaphores[provider.name], track_external(provider.name):
+                        sid = provider.send(notification.recipient, notification.body)
+                except Exception as e:
+                    error = str(e) or e.__class__.__name__
+
+            if error is None:
+                notification.status = "sent"
+                notification.sent_at = datetime.utcnow()
+                notification.last_error = None
+                print(f"SMS sent to {notification.recipient}, SID: {sid}")
+            elif notification.attempts >= self.max_attempts or provider is None:
+                notification.status = "failed"
+                notification.last_error = error
+                print(f"Notification {notification.id} to {notification.recipient} failed permanently: {error}")
+            else:
+                notification.status = "pending"
+                notification.last_error = error
+                notification.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.backoff(notification.attempts))
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+dispatcher = NotificationDispatcher(
+    workers=settings.notification_workers,
+    max_attempts=settings.notification_max_attempts,
+    retry_backoff=settings.notification_retry_backoff,
+)
+for provider_class in PROVIDERS.values():
+    dispatcher.register(provider_class(max_concurrency=settings.sms_max_concurrency))
+
+
+def get_sms_provider() -> SMSProvider:
+    return dispatcher.providers[settings.sms_provider]
+
+
+def enqueue_sms(db: Session, phone: str, body: str) -> bool:
+    """Queue an SMS in the caller's transaction. Returns False if no provider is configured."""
+    provider = get_sms_provider()
+    if not provider.is_configured():
+        return False
+
+    db.add(Notification(
+        channel="sms",
+        provider=provider.name,
+        recipient=phone,
+        body=body,
+        next_attempt_at=datetime.utcnow()
+    ))
+    return True
@@ -0,0 +1,220 @@
+"""
+Pluggable OTP storage.
+
+Codes are stored as HMAC digests, compared in constant time and limited to a
+fixed number of wrong guesses. Expired and used codes are swept periodically
+so the store stays bounded no matter how many codes are generated.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import SessionLocal
+from .models import OTP
+
+# verify() results
+OTP_VALID = "valid"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+
+
+def generate_code() -> str:
+    """Generate a 6-digit OTP"""
+    return str(100000 + secrets.randbelow(900000))
+
+
+def hash_code(phone: str, code: str) -> str:
+    return hmac.new(settings.secret_key.encode(), f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def codes_match(stored_digest: str, phone: str, code: str) -> bool:
+    return hmac.compare_digest(stored_digest or "", hash_code(phone, code))
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class OTPStore(ABC):
+    def __init__(self, ttl_seconds: int = 300, max_attempts: int = 5):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def issue(self, db: Session, phone: str) -> str:
+        """Create a new code for `phone`, replacing any previous one"""
+
+    @abstractmethod
+    def verify(self, db: Session, phone: str, code: str) -> str:
+        """Check and consume a code. Returns OTP_VALID, OTP_INVALID or OTP_EXPIRED."""
+
+    def sweep(self) -> int:
+        """Remove expired and used codes. Returns the number removed."""
+        return 0
+
+
+class DatabaseOTPStore(OTPStore):
+    """Keeps at most one row per phone in the `otps` table"""
+
+    def issue(self, db: Session, phone: str) -> str:
+        code = generate_code()
+        # Delete any existing OTPs for this phone. The new row is committed by the caller
+        # together with the SMS notification.
+        db.query(OTP).filter(OTP.phone == phone).delete(synchronize_session=False)
+        db.add(OTP(
+            phone=phone,
+            otp_code=hash_code(phone, code),
+            expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            attempts=0
+        ))
+        return code
+
+    def verify(self, db: Session, phone: str, code: str) -> str:
+        otp_record = db.query(OTP).filter(
+            OTP.phone == phone,
+            OTP.is_used == False
+        ).order_by(OTP.id.desc()).first()
+        if not otp_record:
+            return OTP_INVALID
+
+        if datetime.utcnow() > _as_utc_naive(otp_record.expires_at):
+            return OTP_EXPIRED
+
+        if not codes_match(otp_record.otp_code, phone, code):
+            # Burn the code once too many wrong guesses were made
+            db.execute(
+                update(OTP)
+                .where(OTP.id == otp_record.id)
+                .values(attempts=OTP.attempts + 1, is_used=OTP.attempts + 1 >= self.max_attempts)
+            )
+            db.commit()
+            return OTP_INVALID
+
+        # Conditional update so that two concurrent verifications can't both succeed
+        result = db.execute(
+            update(OTP)
+            .where(OTP.id == otp_record.id, OTP.is_used == False)
+            .values(is_used=True)
+        )
+        db.commit()
+        return OTP_VALID if result.rowcount == 1 else OTP_INVALID
+
+    def sweep(self) -> int:
+        db = SessionLocal()
+        try:
+            removed = db.query(OTP).filter(
+                or_(OTP.is_used == True, OTP.expires_at < datetime.utcnow())
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+
+class MemoryOTPStore(OTPStore):
+    """Process-local TTL store. Only suitable for a single worker process."""
+
+    def __init__(self, ttl_seconds: int = 300, max_attempts: int = 5):
+        super().__init__(ttl_seconds, max_attempts)
+        # phone -> (digest, expires_at monotonic, attempts)
+        self._codes: Dict[str, Tuple[str, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def issue(self, db: Session, phone: str) -> str:
+        code = generate_code()
+        with self._lock:
+            self._codes[phone] = (hash_code(phone, code), time.monotonic() + self.ttl_seconds, 0)
+        return code
+
+    def verify(self, db: Session, phone: str, code: str) -> str:
+        with self._lock:
+            entry = self._codes.get(phone)
+            if entry is None:
+                return OTP_INVALID
+            digest, expires_at, attempts = entry
+            if time.monotonic() > expires_at:
+                del self._codes[phone]
+                return OTP_EXPIRED
+            if not codes_match(digest, phone, code):
+                if attempts + 1 >= self.max_attempts:
+                    del self._codes[phone]
+                else:
+                    self._codes[phone] = (digest, expires_at, attempts + 1)
+                return OTP_INVALID
+            del self._codes[phone]
+            return OTP_VALID
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [phone for phone, (_, expires_at, _) in self._codes.items() if expires_at < now]
+            for phone in expired:
+                del self._codes[phone]
+        return len(expired)
+
+
+class RedisOTPStore(OTPStore):
+    """Shared TTL store for multi-worker deployments. Redis expires keys itself."""
+
+    # Check, count the attempt and consume in one step, so a key that expires or is used
+    # concurrently is never recreated (HINCRBY on a missing key makes one without a TTL).
+    # KEYS[1] = otp:<phone>, ARGV = digest of the submitted code, max attempts.
+    VERIFY_SCRIPT = """
+    local digest = redis.call("HGET", KEYS[1], "digest")
+    if not digest then
+        return 0
+    end
+    if digest == ARGV[1] then
+        redis.call("DEL", KEYS[1])
+        return 1
+    end
+    if redis.call("HINCRBY", KEYS[1], "attempts", 1) >= tonumber(ARGV[2]) then
+        redis.call("DEL", KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 300, max_attempts: int = 5):
+        super().__init__(ttl_seconds, max_attempts)
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._verify = self._redis.register_script(self.VERIFY_SCRIPT)
+
+    @staticmethod
+    def _key(phone: str) -> str:
+        return f"otp:{phone}"
+
+    def issue(self, db: Session, phone: str) -> str:
+        code = generate_code()
+        key = self._key(phone)
+        pipe = self._redis.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={"digest": hash_code(phone, code), "attempts": 0})
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+        return code
+
+    def verify(self, db: Session, phone: str, code: str) -> str:
+        # Expired keys are indistinguishable from missing ones, so both are just invalid
+        valid = self._verify(keys=[self._key(phone)], args=[hash_code(phone, code), self.max_attempts])
+        return OTP_VALID if valid == 1 else OTP_INVALID
+
+
+def create_store() -> OTPStore:
+    if settings.otp_store == "memory":
+        return MemoryOTPStore(settings.otp_ttl_seconds, settings.otp_max_attempts)
+    if settings.otp_store == "redis":
+        return RedisOTPStore(settings.redis_url, settings.otp_ttl_seconds, settings.otp_max_attempts)
+    return DatabaseOTPStore(settings.otp_ttl_seconds, settings.otp_max_attempts)
+
+
+otp_store = create_store()
@@ -0,0 +1,84 @@
+"""
+Connection pool warmup and out-of-band health checks.
+
+Opening a connection to Neon can mean waking the compute and a TLS
+handshake, hundreds of milliseconds that would otherwise land on the first
+requests after a deploy or an idle period. So:
+
+- `prewarm()` runs at startup and fills the pool with DB_POOL_PREWARM
+  connections before the app takes traffic.
+- `keepalive()` runs every DB_KEEPALIVE_INTERVAL seconds when that is set.
+  It pings each idle connection in turn and replaces dead ones right away,
+  so request checkouts can skip pool_pre_ping's extra round trip.
+
+  Any ping wakes Neon's compute, so with the keepalive on the compute never
+  auto-suspends and is billed as always on. That is why it is off by default
+  (with pre-ping on instead): turn it on deliberately.
+
+If a connection dies between checks, the request that finds it fails once.
+SQLAlchemy then discards it along with every older pooled connection.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from .breaker import DatabaseUnavailable
+from .metrics import registry, Counter
+
+pool_keepalive = registry.register(Counter(
+    "db_pool_keepalive_total", "Idle connections checked by the keepalive job by outcome", ("outcome",)))
+
+
+def _ping(engine: Engine):
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+def prewarm(engine: Engine, connections: int):
+    """Open up to `connections` pooled connections in parallel and leave them idle in the pool"""
+    connections = min(connections, engine.pool.size())
+    if connections <= 0:
+        return
+
+    def hold(_):
+        conn = engine.connect()
+        conn.exec_driver_sql("SELECT 1")
+        return conn
+
+    # Hold them all at once, otherwise every checkout would reuse the first connection
+    held = []
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(hold, i) for i in range(connections)]
+        for future in futures:
+            try:
+                held.append(future.result())
+            except Exception as e:
+                print(f"Connection pool prewarm failed: {e}")
+    for conn in held:
+        conn.close()
+    print(f"Connection pool warmed with {len(held)} connections")
+
+
+def keepalive(engine: Engine):
+    """Ping each idle pooled connection once, opening a replacement for any that died"""
+    # Checkouts take the oldest idle connection, so this walks the idle ones in turn
+    for _ in range(engine.pool.checkedin()):
+        try:
+            _ping(engine)
+            pool_keepalive.inc("ok")
+            continue
+        except DatabaseUnavailable:
+            # Circuit open and not yet time for a probe
+            return
+        except exc.DBAPIError as e:
+            if not e.connection_invalidated:
+                pool_keepalive.inc("failed")
+                print(f"Connection keepalive failed: {e}")
+                return
+        # The dead connection was discarded; open its replacement now rather than during a request
+        try:
+            _ping(engine)
+            pool_keepalive.inc("replaced")
+        except Exception as e:
+            pool_keepalive.inc("failed")
+            print(f"Connection keepalive could not replace a dead connection: {e}")
+            return
@@ -0,0 +1,249 @@
+"""
+Opt-in request profiling.
+
+A request is profiled when it carries `X-Profile: 1` together with an admin
+bearer token, or at random with probability PROFILE_SAMPLE_RATE. While its
+endpoint runs, a sampler thread snapshots the stack of every thread that is
+executing that endpoint each PROFILE_INTERVAL_MS, and every SQL statement is
+recorded with its timing (statement text only, never parameters).
+
+Profiles are kept in a per-worker ring buffer of PROFILE_MAX_STORED entries.
+The response carries `X-Profile-Id`, and /api/admin/profiles serves the
+statement list and a speedscope file (open it at https://www.speedscope.app).
+Requests that are not profiled only pay for a header lookup and a random().
+
+Stacks are matched by endpoint, so concurrent calls to the same route on the
+same worker end up in one another's profiles.
+"""
+import inspect
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from .auth import authenticate_admin
+from .config import settings
+from .metrics import registry, Counter, current_request, route_name
+
+# SQL statements kept per profile
+MAX_QUERIES = 1000
+
+profiled_requests = registry.register(Counter(
+    "profiled_requests_total", "Requests profiled by trigger", ("trigger",)))
+
+Frame = Tuple[str, str, int]
+
+
+class Sampler:
+    """Wall-clock stack sampler for the threads running one endpoint"""
+
+    def __init__(self, scope, interval: float):
+        self.scope = scope
+        self.interval = interval
+        self.samples: List[Tuple[Tuple[Frame, ...], float]] = []
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopping.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            # Set by the router once the request has been matched
+            endpoint = self.scope.get("endpoint")
+            code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint else None
+            if code is None:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    frame_code = frame.f_code
+                    stack.append((frame_code.co_name, frame_code.co_filename, frame_code.co_firstlineno))
+                    if frame_code is code:
+                        # Keep the endpoint and everything it called
+                        self.samples.append((tuple(reversed(stack)), weight))
+                        break
+                    frame = frame.f_back
+
+
+class Profile:
+    def __init__(self, scope, trigger: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.trigger = trigger
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.route = None
+        self.status_code = 500
+        self.duration = 0.0
+        self.samples: List[Tuple[Tuple[Frame, ...], float]] = []
+        # (perf_counter at start, seconds, statement)
+        self.queries: List[Tuple[float, float, str]] = []
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status_code,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": len(self.samples),
+            "sql_statements": len(self.queries),
+            "sql_ms": round(sum(seconds for _, seconds, _ in self.queries) * 1000, 3),
+        }
+
+    def detail(self) -> dict:
+        return {
+            **self.summary(),
+            "queries": [
+                {
+                    "offset_ms": round((started - self.start) * 1000, 3),
+                    "duration_ms": round(seconds * 1000, 3),
+                    "statement": statement,
+                }
+                for started, seconds, statement in self.queries
+            ],
+        }
+
+    def speedscope(self) -> dict:
+        frames: List[dict] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.samples:
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": filename, "line": line})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(round(weight * 1000, 3))
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "daily-care-store",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class ProfileStore:
+    """The most recent `max_entries` profiles of this worker"""
+
+    def __init__(self, max_entries: int):
+        self._profiles: "deque[Profile]" = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+
+profiles = ProfileStore(settings.profile_max_stored)
+
+
+class ProfilingMiddleware:
+    """Must sit inside MetricsMiddleware, whose per-request stats collect the SQL statements"""
+
+    def __init__(self, app, sample_rate: float = 0.0, interval: float = 0.005):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    async def _trigger(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") == b"1":
+            authorization = headers.get(b"authorization", b"").decode("latin-1")
+            if authorization.lower().startswith("bearer "):
+                try:
+                    await run_in_threadpool(authenticate_admin, authorization[7:])
+                    return "header"
+                except HTTPException:
+                    pass
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = await self._trigger(scope)
+        stats = current_request.get()
+        if trigger is None or stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        profiled_requests.inc(trigger)
+        profile = Profile(scope, trigger, self.interval)
+        stats.queries = profile.queries
+        sampler = Sampler(scope, self.interval)
+        sampler_running = True
+
+        def stop_sampler():
+            nonlocal sampler_running
+            if sampler_running:
+                sampler.stop()
+                sampler_running = False
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                # The endpoint has returned; only streamed bodies remain
+                stop_sampler()
+                profile.status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())],
+                }
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            stop_sampler()
+            stats.queries = None
+            del profile.queries[MAX_QUERIES:]
+            profile.samples = sampler.samples
+            profile.duration = time.perf_counter() - profile.start
+            profile.route = route_name(scope)
+            profiles.add(profile)
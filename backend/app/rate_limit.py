@@ -0,0 +1,199 @@
+"""
+Admission control middleware.
+
+Every request spends tokens from the token bucket of its client IP and,
+when it carries a valid token, from its user's bucket as well, so neither
+extra accounts nor extra IPs multiply a client's allowance. Expensive
+routes cost more tokens and also have a per-process concurrency cap, so
+overload is shed with 429/503 instead of queueing in the threadpool.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from jose import JWTError, jwt
+from .config import settings
+from .metrics import rate_limit_rejections
+
+
+@dataclass(frozen=True)
+class RouteCost:
+    cost: float = 1
+    concurrency_group: Optional[str] = None
+
+
+# (method, path) -> cost. Anything not listed costs DEFAULT_COST.
+DEFAULT_COST = RouteCost()
+ROUTE_COSTS: Dict[Tuple[str, str], RouteCost] = {
+    ("POST", "/api/auth/login"): RouteCost(25, "password_hash"),
+    ("POST", "/api/auth/register"): RouteCost(25, "password_hash"),
+    ("POST", "/api/auth/reset-password"): RouteCost(25, "password_hash"),
+    ("POST", "/api/auth/verify-otp"): RouteCost(10),
+    ("POST", "/api/auth/send-otp"): RouteCost(50, "sms"),
+    ("POST", "/api/auth/forgot-password"): RouteCost(50, "sms"),
+    ("POST", "/api/upload/image"): RouteCost(10, "upload"),
+}
+
+# Max in-flight requests per worker process for each group
+CONCURRENCY_LIMITS: Dict[str, int] = {
+    "password_hash": 4,
+    "sms": 8,
+    "upload": 4,
+}
+
+
+# Token bucket backends
+class MemoryBackend:
+    """Process-local token buckets. Least recently used keys are dropped beyond `max_keys`."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill_rate)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisBackend:
+    """Token buckets shared by all workers, updated atomically by a Lua script"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[capacity, refill_rate, cost, time.time()]
+        )
+        return allowed == 1, float(retry_after)
+
+
+def create_backend():
+    if settings.rate_limit_backend == "redis":
+        return RedisBackend(settings.redis_url)
+    return MemoryBackend()
+
+
+# Middleware
+class RateLimitMiddleware:
+    def __init__(self, app, backend=None, capacity: Optional[float] = None, refill_rate: Optional[float] = None):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.capacity = capacity or settings.rate_limit_capacity
+        self.refill_rate = refill_rate or settings.rate_limit_refill_per_second
+        self.in_flight: Dict[str, int] = {group: 0 for group in CONCURRENCY_LIMITS}
+
+    @staticmethod
+    def ip_key(scope) -> str:
+        # With --proxy-headers this is the X-Forwarded-For address, trusted only
+        # from FORWARDED_ALLOW_IPS (see Procfile)
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    @classmethod
+    def bucket_keys(cls, scope) -> Tuple[str, ...]:
+        """Buckets the request is charged to: its IP, plus its user if authenticated"""
+        ip_key, client_key = cls.ip_key(scope), cls.client_key(scope)
+        return (ip_key,) if client_key == ip_key else (ip_key, client_key)
+
+    @classmethod
+    def client_key(cls, scope) -> str:
+        """Authenticated user if the request carries a valid token, otherwise the client IP"""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+                        if payload.get("sub"):
+                            return f"user:{payload['sub']}"
+                    except JWTError:
+                        pass
+                break
+        return cls.ip_key(scope)
+
+    @staticmethod
+    async def reject(send, status_code: int, detail: str, retry_after: float):
+        rate_limit_rejections.inc(str(status_code))
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].rstrip("/") or "/"
+        route_cost = ROUTE_COSTS.get((scope["method"], path), DEFAULT_COST)
+
+        cost = min(route_cost.cost, self.capacity)
+        for key in self.bucket_keys(scope):
+            allowed, retry_after = await self.backend.consume(key, cost, self.capacity, self.refill_rate)
+            if not allowed:
+                await self.reject(send, 429, "Too many requests", retry_after)
+                return
+
+        group = route_cost.concurrency_group
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        # The event loop is single threaded, so a plain counter is enough here
+        if self.in_flight[group] >= CONCURRENCY_LIMITS[group]:
+            await self.reject(send, 503, "Server busy, please retry", 1)
+            return
+        self.in_flight[group] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[group] -= 1
@@ -0,0 +1,92 @@
+"""
+Product rating aggregates.
+
+`Product.rating` (average) and `Product.reviews_count` are updated with a
+single UPDATE in the same transaction as each review change, so sorting by
+rating stays an indexed column read. `reconcile_ratings` recomputes them
+from the reviews table to correct any drift. Products without reviews keep
+the rating they were created with (the seeded catalog has no review rows).
+"""
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.orm import Session
+from .cache import cache
+from .database import SessionLocal
+from .models import Product, Review
+
+_rating = func.coalesce(Product.rating, 0)
+_count = func.coalesce(Product.reviews_count, 0)
+
+
+def review_added(db: Session, product_id: int, rating: int):
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            rating=(_rating * _count + float(rating)) / (_count + 1),
+            reviews_count=_count + 1
+        )
+    )
+
+
+def review_changed(db: Session, product_id: int, old_rating: int, new_rating: int):
+    if old_rating == new_rating:
+        return
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.reviews_count > 0)
+        .values(rating=_rating + float(new_rating - old_rating) / Product.reviews_count)
+    )
+
+
+def review_removed(db: Session, product_id: int, rating: int):
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            rating=case(
+                (_count <= 1, 0.0),
+                else_=(_rating * _count - float(rating)) / (_count - 1)
+            ),
+            reviews_count=case((_count <= 1, 0), else_=_count - 1)
+        )
+    )
+
+
+def reconcile_ratings(db: Session, tolerance: float = 1e-6) -> int:
+    """Recompute rating aggregates from the reviews table. Returns the number of products fixed."""
+    actual = {
+        product_id: (count, float(average))
+        for product_id, count, average in db.query(
+            Review.product_id, func.count(Review.id), func.avg(Review.rating)
+        ).group_by(Review.product_id)
+    }
+
+    fixes = []
+    for product_id, rating, reviews_count in db.query(Product.id, Product.rating, Product.reviews_count):
+        if product_id not in actual:
+            continue
+        expected_count, expected_rating = actual[product_id]
+        if (reviews_count or 0) != expected_count or abs((rating or 0) - expected_rating) > tolerance:
+            fixes.append({"product_id": product_id, "rating": expected_rating, "reviews_count": expected_count})
+
+    if fixes:
+        # Core executemany, so Product.updated_at's onupdate doesn't mark every product as edited
+        products = Product.__table__
+        db.execute(
+            update(products).where(products.c.id == bindparam("product_id")).values(
+                rating=bindparam("rating"), reviews_count=bindparam("reviews_count"),
+                updated_at=products.c.updated_at),
+            fixes)
+        cache.invalidate_on_commit(db, "catalog")
+    db.commit()
+    return len(fixes)
+
+
+def reconcile_job():
+    db = SessionLocal()
+    try:
+        fixed = reconcile_ratings(db)
+        if fixed:
+            print(f"Reconciled ratings for {fixed} products")
+    finally:
+        db.close()
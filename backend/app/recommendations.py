@@ -0,0 +1,124 @@
+"""
+"Frequently bought together" recommendations.
+
+A batch job builds a sparse product co-occurrence matrix from order items
+(orders x products incidence matrix X, co-occurrence C = X^T X) and keeps
+the top-K neighbours of every product in memory. New orders are folded in
+incrementally through a small delta that is merged into the affected rows
+until the next rebuild.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import Order, OrderItem
+
+
+class CoPurchaseIndex:
+    def __init__(self, top_k: int = 8):
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        # Co-occurrence counts from the last build, rows/cols indexed by position in _product_ids
+        self._matrix: Optional[sparse.csr_matrix] = None
+        self._product_ids = np.empty(0, dtype=np.int64)
+        self._positions: Dict[int, int] = {}
+        # Counts from orders placed since the last build: product -> other product -> count
+        self._delta: Dict[int, Dict[int, int]] = defaultdict(dict)
+        # product -> neighbours ordered by co-purchase count
+        self._top: Dict[int, Tuple[int, ...]] = {}
+        self.built_at: Optional[float] = None
+
+    def build(self, db: Session):
+        """Rebuild the index from all non-cancelled orders"""
+        started = time.perf_counter()
+        rows = db.query(OrderItem.order_id, OrderItem.product_id).join(Order).filter(
+            Order.status != "cancelled"
+        ).all()
+        db.rollback()
+
+        if rows:
+            pairs = np.asarray(rows, dtype=np.int64)
+            order_ids, order_index = np.unique(pairs[:, 0], return_inverse=True)
+            product_ids, product_index = np.unique(pairs[:, 1], return_inverse=True)
+            incidence = sparse.csr_matrix(
+                (np.ones(len(pairs), dtype=np.int32), (order_index, product_index)),
+                shape=(len(order_ids), len(product_ids))
+            )
+            # An order counts once per product even if it has duplicate lines
+            incidence.data[:] = 1
+            matrix = (incidence.T @ incidence).tocsr()
+            matrix.setdiag(0)
+            matrix.eliminate_zeros()
+        else:
+            product_ids = np.empty(0, dtype=np.int64)
+            matrix = sparse.csr_matrix((0, 0), dtype=np.int32)
+
+        top = {}
+        for row in range(matrix.shape[0]):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            if start == end:
+                continue
+            counts = matrix.data[start:end]
+            columns = matrix.indices[start:end]
+            if len(counts) > self.top_k:
+                best = np.argpartition(-counts, self.top_k)[:self.top_k]
+            else:
+                best = np.arange(len(counts))
+            # Highest count first, lower product id breaks ties
+            best = best[np.lexsort((product_ids[columns[best]], -counts[best]))]
+            top[int(product_ids[row])] = tuple(int(pid) for pid in product_ids[columns[best]])
+
+        with self._lock:
+            self._matrix = matrix
+            self._product_ids = product_ids
+            self._positions = {int(pid): i for i, pid in enumerate(product_ids)}
+            self._delta = defaultdict(dict)
+            self._top = top
+            self.built_at = time.time()
+        print(f"Built co-purchase index for {len(top)} products in {time.perf_counter() - started:.2f}s")
+
+    def _row_counts(self, product_id: int) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        position = self._positions.get(product_id)
+        if position is not None:
+            start, end = self._matrix.indptr[position], self._matrix.indptr[position + 1]
+            columns = self._product_ids[self._matrix.indices[start:end]]
+            counts = dict(zip(columns.tolist(), self._matrix.data[start:end].tolist()))
+        for other, count in self._delta.get(product_id, {}).items():
+            counts[other] = counts.get(other, 0) + count
+        return counts
+
+    def record_order(self, product_ids: Iterable[int]):
+        """Fold a newly placed order into the index"""
+        products = sorted(set(product_ids))
+        if len(products) < 2:
+            return
+        with self._lock:
+            for product_id in products:
+                delta = self._delta[product_id]
+                for other in products:
+                    if other != product_id:
+                        delta[other] = delta.get(other, 0) + 1
+                counts = self._row_counts(product_id)
+                best = heapq.nsmallest(self.top_k, counts.items(), key=lambda item: (-item[1], item[0]))
+                self._top[product_id] = tuple(pid for pid, _ in best)
+
+    def related(self, product_id: int, limit: Optional[int] = None) -> List[int]:
+        neighbours = self._top.get(product_id, ())
+        return list(neighbours[:limit] if limit else neighbours)
+
+
+index = CoPurchaseIndex()
+
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        index.build(db)
+    finally:
+        db.close()
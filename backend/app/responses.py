@@ -0,0 +1,41 @@
+"""
+Response rendering helpers.
+
+`ORJSONResponse` is the app-wide default response class. Hot catalog routes
+use `orm_response` instead, which validates ORM rows against the response
+schema once and dumps them straight to JSON bytes, skipping FastAPI's
+separate response_model validation and serialization passes.
+"""
+from typing import Any, Dict, Optional
+import orjson
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def get_adapter(response_type) -> TypeAdapter:
+    adapter = _adapters.get(response_type)
+    if adapter is None:
+        adapter = _adapters[response_type] = TypeAdapter(response_type)
+    return adapter
+
+
+def render_orm(response_type, obj) -> bytes:
+    """Validate ORM objects against `response_type` and return JSON bytes"""
+    adapter = get_adapter(response_type)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def orm_response(response_type, obj, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return json_bytes_response(render_orm(response_type, obj), status_code, headers)
@@ -1,21 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, or_
 from typing import List, Optional
-from ..database import get_db
-from ..models import User, Product, Order, Category
-from ..schemas import User as UserSchema, Product as ProductSchema, Order as OrderSchema, ProductCreate, ProductUpdate, CategoryCreate, Category as CategorySchema
-from ..auth import get_current_admin
+from ..database import get_db, ReleasingRoute
+from ..models import User, Product, Order, OrderItem, OrderArchive, Category
+from ..schemas import User as UserSchema, Product as ProductSchema, Order as OrderSchema, ProductCreate, ProductUpdate, CategoryCreate, Category as CategorySchema, AdminBootstrap, ArchivedOrder
+from ..auth import get_current_admin, authenticate_admin, create_stream_ticket, redeem_stream_ticket, STREAM_TICKET_TTL
+from ..responses import orm_response, ORJSONResponse
+from .. import analytics, archive
+from ..cache import cache
+from ..events import broker
+from ..profiling import profiles
+from .products import load_product
 
-router = APIRouter(prefix="/api/admin", tags=["Admin"])
+router = APIRouter(prefix="/api/admin", tags=["Admin"], route_class=ReleasingRoute)
+
+# Seconds between keepalive comments on idle event streams
+STREAM_KEEPALIVE = 15
 
 # Dashboard Stats
 @router.get("/stats")
 def get_dashboard_stats(db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
+    return dashboard_stats(db)
+
+def dashboard_stats(db: Session) -> dict:
     total_users = db.query(func.count(User.id)).scalar()
     total_products = db.query(func.count(Product.id)).scalar()
-    total_orders = db.query(func.count(Order.id)).scalar()
-    total_revenue = db.query(func.sum(Order.total_amount)).filter(Order.payment_status == "completed").scalar() or 0
+    # Archived orders still count towards the all-time totals
+    total_orders = db.query(func.count(Order.id)).scalar() + db.query(func.count(OrderArchive.id)).scalar()
+    total_revenue = (
+        (db.query(func.sum(Order.total_amount)).filter(Order.payment_status == "completed").scalar() or 0)
+        + (db.query(func.sum(OrderArchive.total_amount)).filter(OrderArchive.payment_status == "completed").scalar() or 0)
+    )
     
     pending_orders = db.query(func.count(Order.id)).filter(Order.status == "pending").scalar()
     
@@ -27,6 +47,56 @@ def get_dashboard_stats(db: Session = Depends(get_db), admin: User = Depends(get
         "pending_orders": pending_orders
     }
 
+# Dashboard bootstrap: everything the admin dashboard shows, in one response
+SYNC_OVERLAP = timedelta(seconds=60)
+
+@router.get("/bootstrap")
+def get_bootstrap(
+    since: Optional[datetime] = Query(None, description="`version` from a previous bootstrap; returns only changes"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Stats, categories, products, orders and users. With `since`, only rows changed after that version.
+
+    A delta with more than `limit` changed rows of any kind is answered with a full snapshot
+    instead (`full` is true), since advancing `version` past rows it left out would lose them.
+    """
+    version = datetime.utcnow()
+    products = db.query(Product).options(joinedload(Product.category))
+    orders = orders_with_details(db)
+    users = db.query(User)
+
+    def newest(products, orders, users, limit):
+        return {
+            "products": products.order_by(Product.created_at.desc()).limit(limit).all(),
+            "orders": orders.order_by(Order.created_at.desc()).limit(limit).all(),
+            "users": users.order_by(User.created_at.desc()).limit(limit).all(),
+        }
+
+    full = True
+    if since is not None:
+        # Overlap absorbs clock skew and transactions that committed after they stamped their rows
+        cutoff = (since.astimezone(timezone.utc).replace(tzinfo=None) if since.tzinfo else since) - SYNC_OVERLAP
+        rows = newest(
+            products.filter(or_(Product.updated_at >= cutoff, Product.created_at >= cutoff)),
+            orders.filter(or_(Order.updated_at >= cutoff, Order.created_at >= cutoff)),
+            users.filter(or_(User.updated_at >= cutoff, User.created_at >= cutoff)),
+            limit + 1
+        )
+        full = any(len(changed) > limit for changed in rows.values())
+    if full:
+        rows = newest(products, orders, users, limit)
+
+    return orm_response(AdminBootstrap, {
+        "version": version,
+        "full": full,
+        "stats": dashboard_stats(db),
+        "categories": db.query(Category).all(),
+        **rows,
+    })
+
 # User Management
 @router.get("/users", response_model=List[UserSchema])
 def get_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
@@ -89,6 +159,7 @@ def toggle_user_admin(user_id: int, db: Session = Depends(get_db), admin: User =
         raise HTTPException(status_code=400, detail="Cannot modify your own admin status")
     
     user.is_admin = not user.is_admin
+    cache.invalidate_on_commit(db, "users")
     db.commit()
     db.refresh(user)
     return {"message": f"User admin status updated to {user.is_admin}"}
@@ -100,6 +171,7 @@ def toggle_user_active(user_id: int, db: Session = Depends(get_db), admin: User
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = not user.is_active
+    cache.invalidate_on_commit(db, "users")
     db.commit()
     db.refresh(user)
     return {"message": f"User active status updated to {user.is_active}"}
@@ -120,9 +192,9 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db), admin:
     
     db_product = Product(**product_data)
     db.add(db_product)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    return load_product(db, db_product.id)
 
 @router.put("/products/{product_id}", response_model=ProductSchema)
 def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
@@ -134,9 +206,9 @@ def update_product(product_id: int, product: ProductUpdate, db: Session = Depend
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    return load_product(db, db_product.id)
 
 @router.delete("/products/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
@@ -145,6 +217,7 @@ def delete_product(product_id: int, db: Session = Depends(get_db), admin: User =
         raise HTTPException(status_code=404, detail="Product not found")
     
     db.delete(db_product)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
     return {"message": "Product deleted successfully"}
 
@@ -153,6 +226,7 @@ def delete_product(product_id: int, db: Session = Depends(get_db), admin: User =
 def create_category(category: CategoryCreate, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
     db_category = Category(**category.model_dump())
     db.add(db_category)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -164,17 +238,90 @@ def delete_category(category_id: int, db: Session = Depends(get_db), admin: User
         raise HTTPException(status_code=404, detail="Category not found")
     
     db.delete(db_category)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
     return {"message": "Category deleted successfully"}
 
 # Order Management
 @router.get("/orders", response_model=List[OrderSchema])
 def get_all_orders(skip: int = 0, limit: int = 100, status: Optional[str] = None, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
-    query = db.query(Order)
+    query = orders_with_details(db)
     if status:
         query = query.filter(Order.status == status)
     orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    return orders
+    return orm_response(List[OrderSchema], orders)
+
+ORDER_STREAM_SCOPE = "order-stream"
+
+@router.post("/orders/stream-ticket")
+def create_order_stream_ticket(admin: User = Depends(get_current_admin)):
+    """Single-use ticket for opening /orders/stream from EventSource, which can't send headers"""
+    return {"ticket": create_stream_ticket(ORDER_STREAM_SCOPE), "expires_in": STREAM_TICKET_TTL}
+
+@router.get("/orders/stream")
+async def stream_orders(request: Request, ticket: Optional[str] = Query(None, description="From POST /orders/stream-ticket")):
+    """Server-Sent Events feed of order-created and order-status-changed events"""
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        # Authenticate with a short-lived session so the stream doesn't hold a pooled connection
+        await run_in_threadpool(authenticate_admin, header[7:])
+    elif ticket:
+        # Tickets are short-lived and single-use, so a logged URL is harmless
+        await run_in_threadpool(redeem_stream_ticket, ticket, ORDER_STREAM_SCOPE)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+    async def stream():
+        subscription = broker.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=STREAM_KEEPALIVE)
+                if subscription.lagged:
+                    # Events were dropped; the client should re-sync via /bootstrap?since=
+                    subscription.lagged = False
+                    yield "event: resync\ndata: {}\n\n"
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['event']}\ndata: {orjson.dumps(message['data']).decode()}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+def orders_with_details(db: Session):
+    return db.query(Order).options(
+        joinedload(Order.user),
+        selectinload(Order.items).joinedload(OrderItem.product).joinedload(Product.category)
+    )
+
+@router.get("/orders/archive", response_model=List[ArchivedOrder])
+def get_archived_orders(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Created at or after; lets Postgres skip older partitions"),
+    end: Optional[datetime] = Query(None, description="Created before"),
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """Orders moved to cold storage. Slower than /orders: every row is decompressed."""
+    query = db.query(OrderArchive)
+    if user_id is not None:
+        query = query.filter(OrderArchive.user_id == user_id)
+    if status:
+        query = query.filter(OrderArchive.status == status)
+    if start:
+        query = query.filter(OrderArchive.created_at >= start)
+    if end:
+        query = query.filter(OrderArchive.created_at < end)
+    rows = query.order_by(OrderArchive.created_at.desc()).offset(skip).limit(limit).all()
+    return [archive.unpack(row) for row in rows]
 
 @router.put("/orders/{order_id}/status")
 def update_order_status(order_id: int, status: str, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
@@ -182,11 +329,39 @@ def update_order_status(order_id: int, status: str, db: Session = Depends(get_db
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Row lock so concurrent status changes can't double-count a cancellation
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    analytics.record_status_change(db, order, order.status, status)
+    if order.status != status:
+        broker.publish_on_commit(db, "order-status-changed", {
+            "id": order.id, "status": status, "previous_status": order.status
+        })
     order.status = status
     db.commit()
     db.refresh(order)
     return {"message": f"Order status updated to {status}"}
+
+@router.get("/profiles")
+def list_profiles(admin: User = Depends(get_current_admin)):
+    """Recent request profiles on this worker, newest first"""
+    return [profile.summary() for profile in profiles.list()]
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, admin: User = Depends(get_current_admin)):
+    """Profile summary with every SQL statement the request issued"""
+    return find_profile(profile_id).detail()
+
+@router.get("/profiles/{profile_id}/speedscope")
+def get_profile_speedscope(profile_id: str, admin: User = Depends(get_current_admin)):
+    return ORJSONResponse(find_profile(profile_id).speedscope(), headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'
+    })
+
+def find_profile(profile_id: str):
+    profile = profiles.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found (profiles are kept per worker)")
+    return profile
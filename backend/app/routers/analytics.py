@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..database import get_db, ReleasingRoute
+from ..models import User, Product, Category, OrderRollup, ProductSalesDaily
+from ..auth import get_current_admin
+from .. import analytics
+
+router = APIRouter(prefix="/api/admin/analytics", tags=["Analytics"], route_class=ReleasingRoute)
+
+@router.get("/revenue")
+def get_revenue_series(
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    days: int = Query(30, ge=1, le=730),
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """Orders, units and revenue per bucket, oldest first. Empty buckets are omitted."""
+    rows = db.query(OrderRollup).filter(
+        OrderRollup.granularity == granularity,
+        OrderRollup.bucket_start >= analytics.since(days, granularity)
+    ).order_by(OrderRollup.bucket_start).all()
+    return {
+        "granularity": granularity,
+        "points": [
+            {
+                "bucket": row.bucket_start,
+                "orders": row.order_count,
+                "units": row.units,
+                "revenue": round(row.revenue or 0, 2),
+            }
+            for row in rows
+        ],
+    }
+
+@router.get("/top-products")
+def get_top_products(
+    days: int = Query(30, ge=1, le=730),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    revenue = func.sum(ProductSalesDaily.revenue).label("revenue")
+    rows = db.query(
+        ProductSalesDaily.product_id,
+        Product.name,
+        func.sum(ProductSalesDaily.units).label("units"),
+        func.sum(ProductSalesDaily.order_count).label("orders"),
+        revenue
+    ).outerjoin(Product, Product.id == ProductSalesDaily.product_id).filter(
+        ProductSalesDaily.day >= analytics.since(days)
+    ).group_by(ProductSalesDaily.product_id, Product.name).order_by(revenue.desc()).limit(limit).all()
+    return [
+        {"product_id": row.product_id, "name": row.name, "units": row.units, "orders": row.orders, "revenue": round(row.revenue or 0, 2)}
+        for row in rows
+    ]
+
+@router.get("/category-mix")
+def get_category_mix(
+    days: int = Query(30, ge=1, le=730),
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    revenue = func.sum(ProductSalesDaily.revenue).label("revenue")
+    rows = db.query(
+        ProductSalesDaily.category_id,
+        Category.name,
+        func.sum(ProductSalesDaily.units).label("units"),
+        revenue
+    ).outerjoin(Category, Category.id == ProductSalesDaily.category_id).filter(
+        ProductSalesDaily.day >= analytics.since(days)
+    ).group_by(ProductSalesDaily.category_id, Category.name).order_by(revenue.desc()).all()
+    total = sum(row.revenue or 0 for row in rows) or 1
+    return [
+        {
+            "category_id": row.category_id,
+            "name": row.name,
+            "units": row.units,
+            "revenue": round(row.revenue or 0, 2),
+            "share": round((row.revenue or 0) / total, 4),
+        }
+        for row in rows
+    ]
+
+@router.post("/backfill")
+def backfill_analytics(db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
+    """Rebuild all rollups from the orders table. Scans every order, so run it off-peak."""
+    processed = analytics.backfill(db)
+    return {"message": f"Backfilled analytics from {processed} orders", "orders": processed}
@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
+from datetime import timedelta
 from pydantic import BaseModel
-import random
-from ..database import get_db
-from ..models import User, OTP
+from ..database import get_db, ReleasingRoute
+from ..models import User
 from ..schemas import UserCreate, UserUpdate, User as UserSchema, Token, OTPRequest, OTPVerify
 from ..auth import verify_password, get_password_hash, create_access_token, get_current_user
 from ..config import settings
+from ..cache import cache
+from .. import notifications
+from ..otp_store import otp_store, OTP_VALID, OTP_EXPIRED
 
-router = APIRouter(prefix="/api/auth", tags=["Authentication"])
+router = APIRouter(prefix="/api/auth", tags=["Authentication"], route_class=ReleasingRoute)
 
 @router.post("/register", response_model=UserSchema)
 def register(user: UserCreate, db: Session = Depends(get_db)):
@@ -57,32 +59,31 @@ def update_profile(user_update: UserUpdate, db: Session = Depends(get_db), curre
     for key, value in update_data.items():
         setattr(current_user, key, value)
     
+    cache.invalidate_on_commit(db, "users", current_user.email)
     db.commit()
     db.refresh(current_user)
     return current_user
 
 
 # OTP Login Endpoints
-def send_sms_otp(phone: str, otp_code: str) -> bool:
-    """Send OTP via Twilio SMS"""
-    if not all([settings.twilio_account_sid, settings.twilio_auth_token, settings.twilio_phone_number]):
-        print(f"Twilio not configured. OTP for {phone}: {otp_code}")
-        return False
-    
-    try:
-        from twilio.rest import Client
-        client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
-        
-        message = client.messages.create(
-            body=f"Your PureGlow verification code is: {otp_code}. Valid for 5 minutes.",
-            from_=settings.twilio_phone_number,
-            to=phone
-        )
-        print(f"SMS sent to {phone}, SID: {message.sid}")
-        return True
-    except Exception as e:
-        print(f"Failed to send SMS: {e}")
-        return False
+def queue_sms_otp(db: Session, phone: str, otp_code: str) -> bool:
+    """Queue OTP SMS for background delivery. Returns False if SMS is not configured."""
+    queued = notifications.enqueue_sms(
+        db,
+        phone,
+        f"Your PureGlow verification code is: {otp_code}. Valid for 5 minutes."
+    )
+    if not queued:
+        print(f"SMS not configured. OTP for {phone}: {otp_code}")
+    return queued
+
+def check_otp(db: Session, phone: str, otp: str):
+    """Verify and consume an OTP, raising 400 if it is invalid or expired"""
+    result = otp_store.verify(db, phone, otp)
+    if result == OTP_EXPIRED:
+        raise HTTPException(status_code=400, detail="OTP has expired")
+    if result != OTP_VALID:
+        raise HTTPException(status_code=400, detail="Invalid OTP")
 
 @router.post("/send-otp")
 def send_otp(otp_request: OTPRequest, db: Session = Depends(get_db)):
@@ -91,23 +92,14 @@ def send_otp(otp_request: OTPRequest, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="Phone number not registered")
     
-    # Generate 6-digit OTP
-    otp_code = str(random.randint(100000, 999999))
+    # Generate 6-digit OTP, replacing any existing one for this phone
+    otp_code = otp_store.issue(db, otp_request.phone)
     
-    # Delete any existing OTPs for this phone
-    db.query(OTP).filter(OTP.phone == otp_request.phone).delete()
-    
-    # Create new OTP (expires in 5 minutes)
-    new_otp = OTP(
-        phone=otp_request.phone,
-        otp_code=otp_code,
-        expires_at=datetime.utcnow() + timedelta(minutes=5)
-    )
-    db.add(new_otp)
+    # Queue SMS in the same transaction; workers deliver it after commit
+    sms_sent = queue_sms_otp(db, otp_request.phone, otp_code)
     db.commit()
-    
-    # Send SMS via Twilio
-    sms_sent = send_sms_otp(otp_request.phone, otp_code)
+    if sms_sent:
+        notifications.dispatcher.wake()
     
     response = {
         "message": "OTP sent successfully" if sms_sent else "OTP generated (SMS not configured)",
@@ -122,23 +114,8 @@ def send_otp(otp_request: OTPRequest, db: Session = Depends(get_db)):
 
 @router.post("/verify-otp", response_model=Token)
 def verify_otp(otp_verify: OTPVerify, db: Session = Depends(get_db)):
-    # Find the OTP
-    otp_record = db.query(OTP).filter(
-        OTP.phone == otp_verify.phone,
-        OTP.otp_code == otp_verify.otp,
-        OTP.is_used == False
-    ).first()
-    
-    if not otp_record:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    # Check if OTP is expired
-    if datetime.utcnow() > otp_record.expires_at:
-        raise HTTPException(status_code=400, detail="OTP has expired")
-    
-    # Mark OTP as used
-    otp_record.is_used = True
-    db.commit()
+    # Check and consume the OTP
+    check_otp(db, otp_verify.phone, otp_verify.otp)
     
     # Find user and generate token
     user = db.query(User).filter(User.phone == otp_verify.phone).first()
@@ -169,23 +146,14 @@ def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db)
     if not user:
         raise HTTPException(status_code=404, detail="Phone number not registered")
     
-    # Generate 6-digit OTP
-    otp_code = str(random.randint(100000, 999999))
+    # Generate 6-digit OTP, replacing any existing one for this phone
+    otp_code = otp_store.issue(db, request.phone)
     
-    # Delete any existing OTPs for this phone
-    db.query(OTP).filter(OTP.phone == request.phone).delete()
-    
-    # Create new OTP (expires in 5 minutes)
-    new_otp = OTP(
-        phone=request.phone,
-        otp_code=otp_code,
-        expires_at=datetime.utcnow() + timedelta(minutes=5)
-    )
-    db.add(new_otp)
+    # Queue SMS in the same transaction; workers deliver it after commit
+    sms_sent = queue_sms_otp(db, request.phone, otp_code)
     db.commit()
-    
-    # Send SMS via Twilio
-    sms_sent = send_sms_otp(request.phone, otp_code)
+    if sms_sent:
+        notifications.dispatcher.wake()
     
     response = {
         "message": "OTP sent for password reset" if sms_sent else "OTP generated (SMS not configured)",
@@ -200,22 +168,8 @@ def forgot_password(request: PasswordResetRequest, db: Session = Depends(get_db)
 @router.post("/reset-password")
 def reset_password(request: PasswordResetVerify, db: Session = Depends(get_db)):
     """Verify OTP and reset password"""
-    # Find the OTP
-    otp_record = db.query(OTP).filter(
-        OTP.phone == request.phone,
-        OTP.otp_code == request.otp,
-        OTP.is_used == False
-    ).first()
-    
-    if not otp_record:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    # Check if OTP is expired
-    if datetime.utcnow() > otp_record.expires_at:
-        raise HTTPException(status_code=400, detail="OTP has expired")
-    
-    # Mark OTP as used
-    otp_record.is_used = True
+    # Check and consume the OTP
+    check_otp(db, request.phone, request.otp)
     
     # Find user and update password
     user = db.query(User).filter(User.phone == request.phone).first()
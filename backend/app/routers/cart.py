@@ -1,16 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List
-from ..database import get_db
+from ..database import get_db, ReleasingRoute
 from ..models import CartItem, Product, User
 from ..schemas import CartItem as CartItemSchema, CartItemCreate
 from ..auth import get_current_user
 
-router = APIRouter(prefix="/api/cart", tags=["Cart"])
+router = APIRouter(prefix="/api/cart", tags=["Cart"], route_class=ReleasingRoute)
+
+def cart_items(db: Session):
+    """Cart item query that loads the product and category CartItemSchema serializes"""
+    return db.query(CartItem).options(joinedload(CartItem.product).joinedload(Product.category))
+
+def loaded_cart_item(db: Session, item_id: int) -> CartItem:
+    """Reload a cart item for the response; a concurrent checkout or clear may have removed it"""
+    cart_item = cart_items(db).filter(CartItem.id == item_id).one_or_none()
+    if cart_item is None:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    return cart_item
 
 @router.get("/", response_model=List[CartItemSchema])
 def get_cart(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(CartItem).filter(CartItem.user_id == user.id).all()
+    return cart_items(db).filter(CartItem.user_id == user.id).all()
 
 @router.post("/", response_model=CartItemSchema)
 def add_to_cart(
@@ -30,14 +41,12 @@ def add_to_cart(
     if existing:
         existing.quantity += item.quantity
         db.commit()
-        db.refresh(existing)
-        return existing
+        return loaded_cart_item(db, existing.id)
     
     cart_item = CartItem(user_id=user.id, product_id=item.product_id, quantity=item.quantity)
     db.add(cart_item)
     db.commit()
-    db.refresh(cart_item)
-    return cart_item
+    return loaded_cart_item(db, cart_item.id)
 
 @router.put("/{item_id}", response_model=CartItemSchema)
 def update_cart_item(
@@ -61,8 +70,7 @@ def update_cart_item(
     
     cart_item.quantity = quantity
     db.commit()
-    db.refresh(cart_item)
-    return cart_item
+    return loaded_cart_item(db, cart_item.id)
 
 @router.delete("/{item_id}")
 def remove_from_cart(
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from ..database import get_db
+from ..database import get_db, ReleasingRoute
 from ..models import Category, User
 from ..schemas import Category as CategorySchema, CategoryCreate
 from ..auth import get_current_admin
+from ..responses import render_orm, json_bytes_response
+from ..cache import cache
+from ..stale import catalog_cache
 
-router = APIRouter(prefix="/api/categories", tags=["Categories"])
+router = APIRouter(prefix="/api/categories", tags=["Categories"], route_class=ReleasingRoute)
 
 @router.get("/", response_model=List[CategorySchema])
 def get_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+    return json_bytes_response(catalog_cache.get(
+        db, "catalog", "categories", lambda session: render_orm(List[CategorySchema], session.query(Category).all())
+    ))
 
 @router.get("/{category_id}", response_model=CategorySchema)
 def get_category(category_id: int, db: Session = Depends(get_db)):
@@ -27,6 +32,7 @@ def create_category(
 ):
     db_category = Category(**category.model_dump())
     db.add(db_category)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
     db.refresh(db_category)
     return db_category
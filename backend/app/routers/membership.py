@@ -0,0 +1,60 @@
+import base64
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database import get_db, ReleasingRoute
+from ..models import CartItem, WishlistItem, User
+from ..auth import get_current_user
+
+router = APIRouter(prefix="/api/membership", tags=["Membership"], route_class=ReleasingRoute)
+
+MAX_IDS = 500
+
+def parse_ids(ids: Optional[str]) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    try:
+        parsed = sorted({int(part) for part in ids.split(",") if part.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of product ids")
+    if len(parsed) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request")
+    return parsed
+
+def to_bitset(product_ids: List[int]) -> dict:
+    """Bit i of `bits` (little-endian within each byte) is set when product `base + i` is present"""
+    if not product_ids:
+        return {"base": 0, "bits": ""}
+    base = min(product_ids)
+    bits = bytearray((max(product_ids) - base) // 8 + 1)
+    for product_id in product_ids:
+        offset = product_id - base
+        bits[offset // 8] |= 1 << (offset % 8)
+    return {"base": base, "bits": base64.b64encode(bytes(bits)).decode()}
+
+@router.get("/")
+def get_membership(
+    ids: Optional[str] = Query(None, description="Comma separated product ids, e.g. the visible grid tiles"),
+    format: str = Query("list", pattern="^(list|bitset)$"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """Which products are in the user's wishlist and cart, without serializing any products"""
+    product_ids = parse_ids(ids)
+    wishlist = select(literal("wishlist").label("source"), WishlistItem.product_id).where(WishlistItem.user_id == user.id)
+    cart = select(literal("cart").label("source"), CartItem.product_id).where(CartItem.user_id == user.id)
+    if product_ids is not None:
+        if not product_ids:
+            return {"wishlist": [], "cart": []} if format == "list" else {"wishlist": to_bitset([]), "cart": to_bitset([])}
+        wishlist = wishlist.where(WishlistItem.product_id.in_(product_ids))
+        cart = cart.where(CartItem.product_id.in_(product_ids))
+
+    # One round trip, both halves served by the (user_id, product_id) indexes
+    found = {"wishlist": set(), "cart": set()}
+    for source, product_id in db.execute(union_all(wishlist, cart)):
+        found[source].add(product_id)
+
+    if format == "bitset":
+        return {source: to_bitset(sorted(members)) for source, members in found.items()}
+    return {source: sorted(members) for source, members in found.items()}
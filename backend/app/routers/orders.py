@@ -1,23 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List
-from ..database import get_db
-from ..models import Order, OrderItem, Product, CartItem, User
-from ..schemas import Order as OrderSchema, OrderCreate
+from ..database import get_db, ReleasingRoute
+from ..models import Order, OrderItem, OrderArchive, Product, CartItem, User
+from ..schemas import Order as OrderSchema, OrderCreate, OrderHistoryPage, ArchivedOrder as ArchivedOrderSchema
 from ..auth import get_current_user
+from ..responses import orm_response
+from ..cache import cache
+from ..events import broker
+from .. import recommendations, analytics, archive
 
-router = APIRouter(prefix="/api/orders", tags=["Orders"])
+router = APIRouter(prefix="/api/orders", tags=["Orders"], route_class=ReleasingRoute)
 
-@router.get("/", response_model=List[OrderSchema])
-def get_orders(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(Order).filter(Order.user_id == user.id).order_by(Order.created_at.desc()).all()
+@router.get("/", response_model=OrderHistoryPage)
+def get_orders(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """Order history summaries, newest first. Use GET /api/orders/{id} for items."""
+    item_count = select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(
+        OrderItem.order_id == Order.id
+    ).correlate(Order).scalar_subquery()
+    thumbnail = select(Product.image).join(OrderItem, OrderItem.product_id == Product.id).where(
+        OrderItem.order_id == Order.id
+    ).order_by(OrderItem.id).limit(1).correlate(Order).scalar_subquery()
+
+    # One query for the page; limit + 1 rows tells us if there is another page without a COUNT
+    rows = db.query(
+        Order.id, Order.status, Order.total_amount, Order.payment_status, Order.created_at,
+        item_count.label("item_count"), thumbnail.label("thumbnail")
+    ).filter(Order.user_id == user.id).order_by(
+        Order.created_at.desc(), Order.id.desc()
+    ).offset(skip).limit(limit + 1).all()
+
+    page = {
+        "items": [row._asdict() for row in rows[:limit]],
+        "skip": skip,
+        "limit": limit,
+        "has_more": len(rows) > limit,
+    }
+    if skip == 0:
+        # Header stats for the account page, only needed with the first page
+        page["status_counts"] = dict(
+            db.query(Order.status, func.count(Order.id)).filter(Order.user_id == user.id).group_by(Order.status).all()
+        )
+    return page
+
+@router.get("/archive", response_model=List[ArchivedOrderSchema])
+def get_archived_orders(
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """The user's orders that were moved to cold storage, newest first"""
+    rows = db.query(OrderArchive).filter(OrderArchive.user_id == user.id).order_by(
+        OrderArchive.created_at.desc()
+    ).offset(skip).limit(limit).all()
+    return [archive.unpack(row) for row in rows]
+
+@router.get("/archive/{order_id}", response_model=ArchivedOrderSchema)
+def get_archived_order(order_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    row = db.query(OrderArchive).filter(OrderArchive.id == order_id, OrderArchive.user_id == user.id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return archive.unpack(row)
+
+def load_order(db: Session):
+    """Order query that loads everything OrderSchema serializes"""
+    return db.query(Order).options(
+        joinedload(Order.user),
+        selectinload(Order.items).joinedload(OrderItem.product).joinedload(Product.category)
+    )
 
 @router.get("/{order_id}", response_model=OrderSchema)
 def get_order(order_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
+    order = load_order(db).filter(Order.id == order_id, Order.user_id == user.id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return orm_response(OrderSchema, order)
 
 @router.post("/", response_model=OrderSchema)
 def create_order(
@@ -62,6 +126,21 @@ def create_order(
     
     # Clear cart
     db.query(CartItem).filter(CartItem.user_id == user.id).delete()
+    db.flush()
+    analytics.record_order(db, order)
+    # Stock changed; list pages pick it up when their short TTL expires
+    cache.invalidate_on_commit(db, "catalog", *(f"product:{item_data['product'].id}" for item_data in order_items))
+    broker.publish_on_commit(db, "order-created", {
+        "id": order.id,
+        "user_id": user.id,
+        "customer": user.full_name,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "payment_method": order.payment_method,
+        "item_count": sum(item_data["quantity"] for item_data in order_items),
+    })
     db.commit()
-    db.refresh(order)
-    return order
+    
+    recommendations.index.record_order(item_data["product"].id for item_data in order_items)
+    
+    return orm_response(OrderSchema, load_order(db).filter(Order.id == order.id).one())
@@ -1,12 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_db, ReleasingRoute
 from ..models import Product, Category, User
-from ..schemas import Product as ProductSchema, ProductCreate, ProductUpdate
+from ..schemas import Product as ProductSchema, ProductCreate, ProductUpdate, ProductAvailabilityRequest, ProductAvailability, ProductPage, ProductFacets
 from ..auth import get_current_admin
+from ..responses import render_orm, json_bytes_response
+from ..singleflight import SingleFlight
+from ..cache import cache
+from ..stale import catalog_cache
+from ..config import settings
+from .. import recommendations
 
-router = APIRouter(prefix="/api/products", tags=["Products"])
+router = APIRouter(prefix="/api/products", tags=["Products"], route_class=ReleasingRoute)
+
+# Identical concurrent catalog reads share one query and one rendered body
+catalog_flight = SingleFlight("catalog")
+
+# Lower bounds of the price facet buckets; the last one is open-ended
+PRICE_BUCKETS = (0, 500, 1000, 2000, 5000)
+
+def cached_catalog(db: Session, key: str, render, ttl: Optional[int] = None) -> bytes:
+    """Rendered catalog JSON from the two-tier cache, with misses coalesced through catalog_flight.
+
+    `render(session)` may run on a background thread with its own session (see stale.py),
+    so it must query through the session it is given, not the request's.
+    """
+    return catalog_cache.get(db, "catalog", key, lambda session: catalog_flight.do(key, lambda: render(session)), ttl=ttl)
 
 @router.get("/", response_model=List[ProductSchema])
 def get_products(
@@ -17,10 +38,18 @@ def get_products(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     search: Optional[str] = None,
-    sort_by: Optional[str] = "created_at",
+    sort_by: Optional[str] = "trending",
     db: Session = Depends(get_db)
 ):
-    query = db.query(Product).filter(Product.is_active == True)
+    # Normalized before it is used in the key, so requests sharing an entry run the same query
+    search = search.strip().lower() if search else None
+    key = "list:" + repr((skip, limit, category, product_type, min_price, max_price, search, sort_by))
+    return json_bytes_response(cached_catalog(db, key, lambda session: render_orm(List[ProductSchema], _list_products(
+        session, skip, limit, category, product_type, min_price, max_price, search, sort_by
+    )), ttl=settings.catalog_list_cache_ttl_seconds))
+
+def _list_products(db, skip, limit, category, product_type, min_price, max_price, search, sort_by):
+    query = db.query(Product).options(joinedload(Product.category)).filter(Product.is_active == True)
     
     if category:
         cat = db.query(Category).filter(Category.slug == category).first()
@@ -49,37 +78,206 @@ def get_products(
     elif sort_by == "newest":
         query = query.order_by(Product.created_at.desc())
     else:
-        query = query.order_by(Product.is_bestseller.desc(), Product.created_at.desc())
+        # trending: recent sales velocity, newest first among equals (ix_products_active_popularity)
+        query = query.order_by(Product.popularity_score.desc(), Product.created_at.desc())
     
     return query.offset(skip).limit(limit).all()
 
 @router.get("/bestsellers", response_model=List[ProductSchema])
 def get_bestsellers(limit: int = 4, db: Session = Depends(get_db)):
-    return db.query(Product).filter(
-        Product.is_active == True,
-        Product.is_bestseller == True
-    ).limit(limit).all()
+    return json_bytes_response(cached_catalog(db, f"bestsellers:{limit}", lambda session: render_orm(
+        List[ProductSchema],
+        session.query(Product).options(joinedload(Product.category)).filter(
+            Product.is_active == True,
+            or_(Product.is_bestseller == True, Product.popularity_score > 0)
+        ).order_by(
+            # Best-selling by recent velocity; flagged products fill in until there are sales
+            Product.popularity_score.desc(), Product.is_bestseller.desc(), Product.created_at.desc()
+        ).limit(limit).all()
+    ), ttl=settings.catalog_list_cache_ttl_seconds))
 
 @router.get("/new-arrivals", response_model=List[ProductSchema])
 def get_new_arrivals(limit: int = 4, db: Session = Depends(get_db)):
-    return db.query(Product).filter(
-        Product.is_active == True,
-        Product.is_new == True
-    ).limit(limit).all()
+    return json_bytes_response(cached_catalog(db, f"new-arrivals:{limit}", lambda session: render_orm(
+        List[ProductSchema],
+        session.query(Product).options(joinedload(Product.category)).filter(
+            Product.is_active == True,
+            Product.is_new == True
+        ).limit(limit).all()
+    ), ttl=settings.catalog_list_cache_ttl_seconds))
+
+@router.get("/facets", response_model=ProductFacets)
+def get_facets(
+    category: Optional[str] = None,
+    product_type: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Matching product counts per category, product type and price bucket for the filter sidebar.
+
+    Each facet applies every filter except its own, so the counts show what choosing
+    another option would give.
+    """
+    search = search.strip().lower() if search else None
+    key = "facets:" + repr((category, product_type, min_price, max_price, search))
+    return json_bytes_response(cached_catalog(db, key, lambda session: render_orm(ProductFacets, _facets(
+        session, category, product_type, min_price, max_price, search
+    ))))
+
+def _facets(db, category, product_type, min_price, max_price, search) -> dict:
+    def filters(*skip):
+        conditions = [Product.is_active == True]
+        if category and "category" not in skip:
+            conditions.append(Product.category_id == select(Category.id).where(Category.slug == category).scalar_subquery())
+        if product_type and "product_type" not in skip:
+            conditions.append(Product.product_type == product_type)
+        if min_price is not None and "price" not in skip:
+            conditions.append(Product.price >= min_price)
+        if max_price is not None and "price" not in skip:
+            conditions.append(Product.price <= max_price)
+        if search:
+            conditions.append(Product.name.ilike(f"%{search}%"))
+        return conditions
+
+    bucket = case(
+        *((Product.price < upper, str(index)) for index, upper in enumerate(PRICE_BUCKETS[1:])),
+        else_=str(len(PRICE_BUCKETS) - 1)
+    )
+    # Grouped through a subquery: Postgres won't match a GROUP BY expression with bound parameters
+    buckets = select(bucket.label("bucket")).where(*filters("price")).subquery()
+    # All four counts in one round trip
+    rows = db.execute(union_all(
+        select(literal("total").label("facet"), literal("").label("value"), func.count(Product.id)).where(*filters()),
+        select(literal("category"), Category.slug, func.count(Product.id)).join(
+            Category, Category.id == Product.category_id
+        ).where(*filters("category")).group_by(Category.slug),
+        select(literal("product_type"), Product.product_type, func.count(Product.id)).where(
+            *filters("product_type"), Product.product_type.isnot(None)
+        ).group_by(Product.product_type),
+        select(literal("price"), buckets.c.bucket, func.count()).group_by(buckets.c.bucket),
+    )).all()
+
+    counts = {"total": {}, "category": {}, "product_type": {}, "price": {}}
+    for facet, value, count in rows:
+        counts[facet][value] = count
+    return {
+        "total": counts["total"].get("", 0),
+        "categories": [{"value": v, "count": c} for v, c in sorted(counts["category"].items())],
+        "product_types": [{"value": v, "count": c} for v, c in sorted(counts["product_type"].items())],
+        "price": [
+            {
+                "min": lower,
+                "max": PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None,
+                "count": counts["price"].get(str(index), 0),
+            }
+            for index, lower in enumerate(PRICE_BUCKETS)
+        ],
+    }
 
 @router.get("/slug/{slug}", response_model=ProductSchema)
 def get_product_by_slug(slug: str, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.slug == slug).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    def resolve(session):
+        product = session.query(Product.id).filter(Product.slug == slug).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product.id
+    # Slugs only change through admin edits, which invalidate the whole catalog namespace
+    return json_bytes_response(product_body(db, cached_catalog(db, f"slug:{slug}", resolve)))
 
 @router.get("/{product_id}", response_model=ProductSchema)
 def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    return json_bytes_response(product_body(db, product_id))
+
+def load_product(db: Session, product_id: int) -> Product:
+    """Product with its category loaded, so serializing it needs no further queries"""
+    return db.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).one()
+
+def product_body(db: Session, product_id: int) -> bytes:
+    """Rendered product detail. Invalidate "product:<id>" in the catalog namespace when it changes."""
+    def fetch(session):
+        product = session.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return render_orm(ProductSchema, product)
+    return cached_catalog(db, f"product:{product_id}", fetch)
+
+@router.get("/{product_id}/related", response_model=List[ProductSchema])
+def get_related_products(product_id: int, limit: int = Query(4, ge=1, le=20), db: Session = Depends(get_db)):
+    """Products frequently bought together with this one, topped up from the same category"""
+    return json_bytes_response(cached_catalog(db, f"related:{product_id}:{limit}", lambda session: render_orm(
+        List[ProductSchema], related_products(session, product_id, limit)
+    ), ttl=settings.catalog_list_cache_ttl_seconds))
+
+@router.get("/{product_id}/page", response_model=ProductPage)
+def get_product_page(product_id: int, db: Session = Depends(get_db)):
+    """Everything the product detail page needs in one response"""
+    stamp = db.query(Product.created_at, Product.updated_at).filter(Product.id == product_id).first()
+    if not stamp:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+
+    def render(session):
+        product = session.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return render_orm(ProductPage, {
+            "product": product,
+            "related": related_products(session, product_id, 4, product.category_id),
+            "availability": product,
+        })
+
+    # Any change to the product (stock, price, rating) moves updated_at and so the key;
+    # related items refresh on the list TTL
+    version = stamp.updated_at or stamp.created_at
+    key = f"page:{product_id}:{version.isoformat() if version else ''}"
+    return json_bytes_response(cached_catalog(db, key, render, ttl=settings.catalog_list_cache_ttl_seconds))
+
+def related_products(db: Session, product_id: int, limit: int, category_id: Optional[int] = None) -> List[Product]:
+    related_ids = recommendations.index.related(product_id)
+    products = []
+    if related_ids:
+        by_id = {
+            p.id: p for p in db.query(Product).options(joinedload(Product.category)).filter(
+                Product.id.in_(related_ids),
+                Product.is_active == True
+            )
+        }
+        products = [by_id[pid] for pid in related_ids if pid in by_id][:limit]
+
+    if len(products) < limit:
+        if category_id is None:
+            product = db.query(Product.category_id).filter(Product.id == product_id).first()
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            category_id = product.category_id
+        exclude = [product_id] + [p.id for p in products]
+        products += db.query(Product).options(joinedload(Product.category)).filter(
+            Product.category_id == category_id,
+            Product.is_active == True,
+            Product.id.notin_(exclude)
+        ).order_by(Product.popularity_score.desc(), Product.created_at.desc()).limit(limit - len(products)).all()
+
+    return products
+
+@router.post("/availability", response_model=List[ProductAvailability])
+def get_availability(request: ProductAvailabilityRequest, db: Session = Depends(get_db)):
+    """Current price and stock for a batch of products (e.g. cart revalidation). Unknown ids are omitted."""
+    if not request.ids:
+        return []
+    rows = db.query(
+        Product.id, Product.price, Product.original_price, Product.stock, Product.is_active
+    ).filter(Product.id.in_(set(request.ids))).all()
+    return [
+        {
+            "id": row.id,
+            "price": row.price,
+            "original_price": row.original_price,
+            "stock": row.stock or 0,
+            "is_active": bool(row.is_active),
+        }
+        for row in rows
+    ]
 
 @router.post("/", response_model=ProductSchema)
 def create_product(
@@ -89,9 +287,9 @@ def create_product(
 ):
     db_product = Product(**product.model_dump())
     db.add(db_product)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    return load_product(db, db_product.id)
 
 @router.put("/{product_id}", response_model=ProductSchema)
 def update_product(
@@ -108,9 +306,9 @@ def update_product(
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    return load_product(db, db_product.id)
 
 @router.delete("/{product_id}")
 def delete_product(
@@ -123,5 +321,6 @@ def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
     
     db.delete(db_product)
+    cache.invalidate_on_commit(db, "catalog")
     db.commit()
     return {"message": "Product deleted successfully"}
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, joinedload
+from ..database import get_db, ReleasingRoute
+from ..models import Review, Product, User
+from ..schemas import Review as ReviewSchema, ReviewCreate, ReviewUpdate, ReviewPage
+from ..auth import get_current_user, get_current_admin
+from .. import ratings
+from ..cache import cache
+
+router = APIRouter(tags=["Reviews"], route_class=ReleasingRoute)
+
+@router.get("/api/products/{product_id}/reviews", response_model=ReviewPage)
+def get_product_reviews(
+    product_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    product = db.query(Product.rating, Product.reviews_count).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    reviews = db.query(Review).options(joinedload(Review.user)).filter(
+        Review.product_id == product_id
+    ).order_by(Review.created_at.desc(), Review.id.desc()).offset(skip).limit(limit).all()
+
+    # The maintained count doubles as the total, so no COUNT(*) per page
+    return {
+        "items": reviews,
+        "total": product.reviews_count or 0,
+        "skip": skip,
+        "limit": limit,
+        "rating": product.rating or 0,
+    }
+
+@router.post("/api/products/{product_id}/reviews", response_model=ReviewSchema)
+def create_review(
+    product_id: int,
+    review: ReviewCreate,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    existing = db.query(Review.id).filter(Review.product_id == product_id, Review.user_id == user.id).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="You have already reviewed this product")
+
+    db_review = Review(product_id=product_id, user_id=user.id, **review.model_dump())
+    db.add(db_review)
+    db.flush()
+    ratings.review_added(db, product_id, review.rating)
+    cache.invalidate_on_commit(db, "catalog", f"product:{product_id}")
+    db.commit()
+    db.refresh(db_review)
+    return db_review
+
+@router.put("/api/reviews/{review_id}", response_model=ReviewSchema)
+def update_review(
+    review_id: int,
+    review: ReviewUpdate,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    db_review = db.query(Review).filter(Review.id == review_id, Review.user_id == user.id).first()
+    if not db_review:
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    old_rating = db_review.rating
+    update_data = review.model_dump(exclude_unset=True, exclude_none=True)
+    for key, value in update_data.items():
+        setattr(db_review, key, value)
+    db.flush()
+    ratings.review_changed(db, db_review.product_id, old_rating, db_review.rating)
+    cache.invalidate_on_commit(db, "catalog", f"product:{db_review.product_id}")
+    db.commit()
+    db.refresh(db_review)
+    return db_review
+
+@router.delete("/api/reviews/{review_id}")
+def delete_review(review_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    db_review = db.query(Review).filter(Review.id == review_id).first()
+    if not db_review or (db_review.user_id != user.id and not user.is_admin):
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    ratings.review_removed(db, db_review.product_id, db_review.rating)
+    db.delete(db_review)
+    cache.invalidate_on_commit(db, "catalog", f"product:{db_review.product_id}")
+    db.commit()
+    return {"message": "Review deleted successfully"}
+
+@router.post("/api/admin/reviews/reconcile")
+def reconcile_ratings(db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
+    """Recompute product rating aggregates from the reviews table"""
+    fixed = ratings.reconcile_ratings(db)
+    return {"message": f"Reconciled ratings for {fixed} products", "fixed": fixed}
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from ..auth import get_current_admin
+from ..database import ReleasingRoute
 from ..config import settings
 from ..models import User
+from ..metrics import track_external
 import base64
 import httpx
 
-router = APIRouter(prefix="/api/upload", tags=["Upload"])
+router = APIRouter(prefix="/api/upload", tags=["Upload"], route_class=ReleasingRoute)
 
 @router.post("/image")
 async def upload_image(
@@ -31,14 +33,15 @@ async def upload_image(
         try:
             base64_image = base64.b64encode(contents).decode('utf-8')
             async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.imgbb.com/1/upload",
-                    data={
-                        "key": settings.imgbb_api_key,
-                        "image": base64_image
-                    },
-                    timeout=30.0
-                )
+                with track_external("imgbb"):
+                    response = await client.post(
+                        "https://api.imgbb.com/1/upload",
+                        data={
+                            "key": settings.imgbb_api_key,
+                            "image": base64_image
+                        },
+                        timeout=30.0
+                    )
                 if response.status_code == 200:
                     data = response.json()
                     return {
@@ -64,11 +67,12 @@ async def upload_image(
                 api_secret=settings.cloudinary_api_secret
             )
             
-            result = cloudinary.uploader.upload(
-                contents,
-                folder="pureglow-products",
-                resource_type="image"
-            )
+            with track_external("cloudinary"):
+                result = cloudinary.uploader.upload(
+                    contents,
+                    folder="pureglow-products",
+                    resource_type="image"
+                )
             
             return {
                 "url": result["secure_url"],
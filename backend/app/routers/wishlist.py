@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List
-from ..database import get_db
+from ..database import get_db, ReleasingRoute
 from ..models import WishlistItem, Product, User
 from ..schemas import WishlistItem as WishlistItemSchema, WishlistItemCreate
 from ..auth import get_current_user
 
-router = APIRouter(prefix="/api/wishlist", tags=["Wishlist"])
+router = APIRouter(prefix="/api/wishlist", tags=["Wishlist"], route_class=ReleasingRoute)
+
+def wishlist_items(db: Session):
+    """Wishlist item query that loads the product and category WishlistItemSchema serializes"""
+    return db.query(WishlistItem).options(joinedload(WishlistItem.product).joinedload(Product.category))
 
 @router.get("/", response_model=List[WishlistItemSchema])
 def get_wishlist(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(WishlistItem).filter(WishlistItem.user_id == user.id).all()
+    return wishlist_items(db).filter(WishlistItem.user_id == user.id).all()
 
 @router.post("/", response_model=WishlistItemSchema)
 def add_to_wishlist(
@@ -33,8 +37,7 @@ def add_to_wishlist(
     wishlist_item = WishlistItem(user_id=user.id, product_id=item.product_id)
     db.add(wishlist_item)
     db.commit()
-    db.refresh(wishlist_item)
-    return wishlist_item
+    return wishlist_items(db).filter(WishlistItem.id == wishlist_item.id).one()
 
 @router.delete("/{product_id}")
 def remove_from_wishlist(
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # User Schemas
@@ -107,6 +107,78 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductAvailabilityRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=500)
+
+class ProductAvailability(BaseModel):
+    id: int
+    price: float
+    original_price: Optional[float] = None
+    stock: int
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
+class ProductPage(BaseModel):
+    product: Product
+    related: List[Product]
+    availability: ProductAvailability
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucketCount(BaseModel):
+    min: float
+    max: Optional[float] = None  # None for the open-ended top bucket
+    count: int
+
+class ProductFacets(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    product_types: List[FacetCount]
+    price: List[PriceBucketCount]
+
+# Review Schemas
+class ReviewCreate(BaseModel):
+    rating: int = Field(ge=1, le=5)
+    title: Optional[str] = None
+    comment: Optional[str] = None
+
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(default=None, ge=1, le=5)
+    title: Optional[str] = None
+    comment: Optional[str] = None
+
+class ReviewAuthor(BaseModel):
+    id: int
+    full_name: str
+
+    class Config:
+        from_attributes = True
+
+class Review(BaseModel):
+    id: int
+    product_id: int
+    user_id: int
+    rating: int
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    user: Optional[ReviewAuthor] = None
+
+    class Config:
+        from_attributes = True
+
+class ReviewPage(BaseModel):
+    items: List[Review]
+    total: int
+    skip: int
+    limit: int
+    rating: float
+
 # Cart Schemas
 class CartItemCreate(BaseModel):
     product_id: int
@@ -167,3 +239,50 @@ class Order(BaseModel):
 
     class Config:
         from_attributes = True
+
+class OrderSummary(BaseModel):
+    id: int
+    status: str
+    total_amount: float
+    payment_status: str
+    created_at: datetime
+    item_count: int
+    thumbnail: Optional[str] = None
+
+class OrderHistoryPage(BaseModel):
+    items: List[OrderSummary]
+    skip: int
+    limit: int
+    has_more: bool
+    status_counts: Optional[Dict[str, int]] = None
+
+class ArchivedOrderItem(BaseModel):
+    product_id: int
+    quantity: int
+    price: float
+    # Product details as they were when the order was archived
+    name: Optional[str] = None
+    image: Optional[str] = None
+
+class ArchivedOrder(BaseModel):
+    id: int
+    user_id: int
+    status: str
+    total_amount: float
+    shipping_address: Optional[dict] = None
+    payment_method: Optional[str] = None
+    payment_status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
+    items: List[ArchivedOrderItem] = []
+
+# Admin Schemas
+class AdminBootstrap(BaseModel):
+    version: datetime
+    full: bool
+    stats: dict
+    categories: List[Category]
+    products: List[Product]
+    orders: List[Order]
+    users: List[User]
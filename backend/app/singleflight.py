@@ -0,0 +1,57 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one execution: the first
+caller runs the function, the rest wait for it and get the same result (or
+the same exception). Nothing is kept once the call finishes, so this only
+collapses identical requests that are in flight at the same moment, e.g. a
+burst of hits on a popular category page.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from .metrics import registry, Counter
+
+singleflight_requests = registry.register(Counter(
+    "singleflight_requests_total", "Coalesced read paths by group and role", ("group", "role")))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, group: str):
+        self.group = group
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            singleflight_requests.inc(self.group, "coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        singleflight_requests.inc(self.group, "leader")
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
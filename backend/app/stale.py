@@ -0,0 +1,157 @@
+"""
+Stale-while-revalidate for cached catalog reads.
+
+Next to the regular cache, each worker keeps the last good value of every
+catalog key for up to CATALOG_STALE_SECONDS. On a cache miss:
+
+- If the last good value was stored under the current namespace version
+  and its key wasn't invalidated on its own since (the entry merely
+  expired, nothing was edited), it is returned right away and the key is
+  reloaded on a background thread with its own session.
+- Otherwise (an edit invalidated it, or there is none) the request
+  loads it as usual. If that fails because the database is unreachable or
+  its circuit breaker is open (see breaker.py), the last good value is
+  served instead of an error.
+
+So a database outage costs the catalog nothing until its copies age out;
+only keys no one has read recently fail. Loaders take the session to use,
+because a background reload can't share the request's.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional, Set, Tuple
+from fastapi import HTTPException
+from sqlalchemy import exc
+from sqlalchemy.orm import Session
+from .breaker import DatabaseUnavailable
+from .cache import Cache, cache, cache_requests
+from .config import settings
+from .database import SessionLocal
+from .metrics import registry, Counter
+
+# Failures to reach the database, as opposed to errors in the query itself
+DATABASE_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError, DatabaseUnavailable)
+
+stale_served = registry.register(Counter(
+    "cache_stale_served_total", "Stale cached values served by namespace and reason", ("namespace", "reason")))
+stale_refreshes = registry.register(Counter(
+    "cache_stale_refreshes_total", "Background reloads of stale values by outcome", ("outcome",)))
+
+
+class StaleStore:
+    """Last good value per key with the namespace version it was loaded under, and whether it was edited since"""
+
+    def __init__(self, max_age: float, max_entries: int):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, int, Any, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Tuple[int, Any, bool]]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            stored_at, version, value, edited = entry
+            if time.monotonic() - stored_at > self.max_age:
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return version, value, edited
+
+    def mark_edited(self, namespace: str, key: Hashable):
+        """Keep the value for database outages only"""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                self._entries[(namespace, key)] = entry[:3] + (True,)
+
+    def put(self, namespace: str, key: Hashable, version: int, value: Any):
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic(), version, value, False)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: Hashable):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+
+class StaleWhileRevalidate:
+    def __init__(self, cache: Cache, max_stale: float, max_entries: int, workers: int = 2):
+        self.cache = cache
+        self.enabled = max_stale > 0
+        self.stale = StaleStore(max_stale, max_entries)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stale-refresh")
+        self._refreshing: Set[Tuple[str, Hashable]] = set()
+        self._lock = threading.Lock()
+        cache.on_key_invalidated(self.stale.mark_edited)
+
+    def get(self, db: Session, namespace: str, key: Hashable, loader: Callable[[Session], Any], ttl: Optional[float] = None) -> Any:
+        """Like Cache.get_or_set, with `loader(session)` and the stale fallbacks described above"""
+        if not self.enabled:
+            return self.cache.get_or_set(namespace, key, lambda: loader(db), ttl=ttl)
+
+        hit, value = self.cache.lookup(namespace, key, ttl)
+        if hit:
+            return value
+
+        version = self.cache.version(namespace)
+        stale = self.stale.get(namespace, key)
+        if stale is not None and version >= 0 and stale[0] == version and not stale[2]:
+            stale_served.inc(namespace, "revalidating")
+            self._refresh(namespace, key, loader, ttl, version)
+            return stale[1]
+
+        started = time.monotonic()
+        try:
+            value = loader(db)
+        except DATABASE_ERRORS:
+            if stale is None:
+                raise
+            stale_served.inc(namespace, "database-error")
+            return stale[1]
+        cache_requests.inc(namespace, "miss" if version >= 0 else "unavailable")
+        self._keep(namespace, key, value, ttl, version, started)
+        return value
+
+    def _keep(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float], version: int, started: float):
+        # A value loaded before its key was invalidated is already out of date
+        if self.cache.invalidated_since(namespace, key, started):
+            return
+        self.cache.store(namespace, key, value, ttl, version)
+        self.stale.put(namespace, key, version, value)
+
+    def _refresh(self, namespace: str, key: Hashable, loader: Callable[[Session], Any], ttl: Optional[float], version: int):
+        with self._lock:
+            if (namespace, key) in self._refreshing:
+                return
+            self._refreshing.add((namespace, key))
+        self._executor.submit(self._reload, namespace, key, loader, ttl, version)
+
+    def _reload(self, namespace: str, key: Hashable, loader: Callable[[Session], Any], ttl: Optional[float], version: int):
+        started = time.monotonic()
+        try:
+            with SessionLocal() as db:
+                value = loader(db)
+            self._keep(namespace, key, value, ttl, version, started)
+            stale_refreshes.inc("ok")
+        except DATABASE_ERRORS:
+            # Keep serving the stale value; the next miss tries again
+            stale_refreshes.inc("unavailable")
+        except HTTPException:
+            # e.g. the product is gone: stop serving it
+            self.stale.delete(namespace, key)
+            stale_refreshes.inc("dropped")
+        except Exception as e:
+            stale_refreshes.inc("failed")
+            print(f"Background refresh of {namespace}:{key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard((namespace, key))
+
+
+catalog_cache = StaleWhileRevalidate(cache, settings.catalog_stale_seconds, settings.catalog_stale_max_entries)
@@ -0,0 +1 @@
+# Benchmark tooling: synthetic data generator and load-test harness
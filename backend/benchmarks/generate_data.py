@@ -0,0 +1,204 @@
+"""
+Generate a large synthetic dataset for benchmarks and load tests.
+
+Usage (from the backend directory):
+    python -m benchmarks.generate_data --products 100000 --users 50000 --orders 1000000
+
+Rows are written with bulk INSERTs in batches using explicit ids, then the
+Postgres id sequences are moved past them. Every generated user can log in
+with password "benchmark123" as user<N>@bench.pureglow.com.
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text
+from app.database import SessionLocal, engine
+from app.models import User, Category, Product, Order, OrderItem, CartItem, WishlistItem
+from app.auth import get_password_hash
+from app.migrations import sync_schema
+from app import analytics
+
+PASSWORD = "benchmark123"
+
+CATEGORIES = [
+    ("Skincare", "skincare", "✨"),
+    ("Haircare", "haircare", "💇"),
+    ("Bodycare", "bodycare", "🧴"),
+    ("Wellness", "wellness", "💊"),
+    ("Makeup", "makeup", "💄"),
+    ("Fragrance", "fragrance", "🌸"),
+]
+PRODUCT_TYPES = ["serum", "cream", "oil", "tablet", "scrub"]
+ADJECTIVES = ["Glow", "Hydrating", "Repair", "Radiance", "Calming", "Daily", "Intense", "Gentle", "Pure", "Vitamin C"]
+INGREDIENTS = ["Niacinamide", "Hyaluronic Acid", "Vitamin C", "Retinol", "Ceramides", "Aloe Vera", "Shea Butter", "Zinc", "Biotin", "Argan Oil"]
+BENEFITS = ["Brightens", "Hydrates", "Soothes", "Repairs", "Protects", "Strengthens", "Smooths"]
+STATUSES = ["pending", "confirmed", "shipped", "delivered", "delivered", "delivered", "cancelled"]
+
+
+def next_id(db, model) -> int:
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def bulk_insert(db, model, rows, batch_size: int):
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(model), rows[start:start + batch_size])
+    db.commit()
+
+
+def fix_sequences(db, models):
+    if engine.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+    db.commit()
+
+
+def generate(products: int, users: int, orders: int, batch_size: int, seed: int):
+    rng = random.Random(seed)
+    sync_schema(engine)
+    db = SessionLocal()
+    try:
+        # Categories
+        category_ids = []
+        for name, slug, icon in CATEGORIES:
+            category = db.query(Category).filter(Category.slug == slug).first()
+            if not category:
+                category = Category(name=name, slug=slug, icon=icon, description=f"{name} products")
+                db.add(category)
+                db.flush()
+            category_ids.append(category.id)
+        db.commit()
+
+        # Products
+        started = time.perf_counter()
+        first_product = next_id(db, Product)
+        now = datetime.utcnow()
+        rows = []
+        for i in range(products):
+            product_id = first_product + i
+            price = round(rng.uniform(99, 2999), 0)
+            rows.append({
+                "id": product_id,
+                "name": f"{rng.choice(ADJECTIVES)} {rng.choice(PRODUCT_TYPES).title()} {product_id}",
+                "slug": f"bench-product-{product_id}",
+                "description": "Synthetic benchmark product. " * rng.randint(2, 6),
+                "price": price,
+                "original_price": price * 1.25 if rng.random() < 0.4 else None,
+                "image": f"https://example.com/images/{product_id}.jpg",
+                "images": [f"https://example.com/images/{product_id}-{n}.jpg" for n in range(rng.randint(0, 3))],
+                "category_id": rng.choice(category_ids),
+                "product_type": rng.choice(PRODUCT_TYPES),
+                "rating": 0,
+                "reviews_count": 0,
+                "stock": rng.randint(0, 500),
+                "is_new": rng.random() < 0.1,
+                "is_bestseller": rng.random() < 0.05,
+                "is_active": rng.random() < 0.97,
+                "ingredients": rng.sample(INGREDIENTS, rng.randint(2, 5)),
+                "benefits": rng.sample(BENEFITS, rng.randint(1, 3)),
+                "created_at": now - timedelta(days=rng.uniform(0, 730)),
+            })
+        bulk_insert(db, Product, rows, batch_size)
+        prices = {row["id"]: row["price"] for row in rows} or dict(db.query(Product.id, Product.price).all())
+        product_ids = list(prices)
+        print(f"Inserted {products} products in {time.perf_counter() - started:.1f}s")
+
+        # Users share one password hash; hashing 50k passwords would take hours
+        started = time.perf_counter()
+        hashed_password = get_password_hash(PASSWORD)
+        first_user = next_id(db, User)
+        rows = [{
+            "id": first_user + i,
+            "email": f"user{first_user + i}@bench.pureglow.com",
+            "hashed_password": hashed_password,
+            "full_name": f"Bench User {first_user + i}",
+            "phone": f"+9100{first_user + i:08d}",
+            "is_active": True,
+            "is_admin": False,
+            "created_at": now - timedelta(days=rng.uniform(0, 730)),
+        } for i in range(users)]
+        bulk_insert(db, User, rows, batch_size)
+        user_ids = [row["id"] for row in rows]
+        print(f"Inserted {users} users in {time.perf_counter() - started:.1f}s")
+
+        if not user_ids or not product_ids:
+            fix_sequences(db, [Product, User])
+            return
+
+        # Orders and order items, written in chunks to bound memory
+        started = time.perf_counter()
+        order_id = next_id(db, Order)
+        item_id = next_id(db, OrderItem)
+        # Skew purchases towards a popular head of the catalog
+        cum_weights = list(itertools.accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(len(product_ids))))
+        for chunk_start in range(0, orders, batch_size):
+            order_rows, item_rows = [], []
+            chunk = min(batch_size, orders - chunk_start)
+            picks = rng.choices(product_ids, cum_weights=cum_weights, k=chunk * 4)
+            for n in range(chunk):
+                created_at = now - timedelta(days=rng.uniform(0, 365))
+                total = 0.0
+                for product_id in set(picks[n * 4:n * 4 + rng.randint(1, 4)]):
+                    quantity = rng.randint(1, 3)
+                    price = prices.get(product_id, 499.0)
+                    total += price * quantity
+                    item_rows.append({"id": item_id, "order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price})
+                    item_id += 1
+                status = rng.choice(STATUSES)
+                order_rows.append({
+                    "id": order_id,
+                    "user_id": rng.choice(user_ids),
+                    "status": status,
+                    "total_amount": round(total * 1.18, 2),
+                    "shipping_address": {"city": "Bengaluru", "pincode": "560001"},
+                    "payment_method": rng.choice(["cod", "upi", "card"]),
+                    "payment_status": "completed" if status == "delivered" else "pending",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+                order_id += 1
+            db.execute(insert(Order), order_rows)
+            db.execute(insert(OrderItem), item_rows)
+            db.commit()
+        print(f"Inserted {orders} orders in {time.perf_counter() - started:.1f}s")
+
+        # Carts and wishlists for a fifth of the users
+        started = time.perf_counter()
+        cart_rows, wishlist_rows = [], []
+        cart_id, wishlist_id = next_id(db, CartItem), next_id(db, WishlistItem)
+        for user_id in rng.sample(user_ids, max(1, len(user_ids) // 5)):
+            for product_id in set(rng.choices(product_ids, k=rng.randint(1, 5))):
+                cart_rows.append({"id": cart_id, "user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)})
+                cart_id += 1
+            for product_id in set(rng.choices(product_ids, k=rng.randint(1, 12))):
+                wishlist_rows.append({"id": wishlist_id, "user_id": user_id, "product_id": product_id})
+                wishlist_id += 1
+        bulk_insert(db, CartItem, cart_rows, batch_size)
+        bulk_insert(db, WishlistItem, wishlist_rows, batch_size)
+        print(f"Inserted {len(cart_rows)} cart items and {len(wishlist_rows)} wishlist items in {time.perf_counter() - started:.1f}s")
+
+        fix_sequences(db, [Product, User, Order, OrderItem, CartItem, WishlistItem])
+
+        # Orders were bulk inserted, so the sales rollups are rebuilt in one pass
+        started = time.perf_counter()
+        analytics.backfill(db)
+        print(f"Backfilled sales analytics in {time.perf_counter() - started:.1f}s")
+        print("\n✅ Benchmark data generated!")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark data")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.products, args.users, args.orders, args.batch_size, args.seed)
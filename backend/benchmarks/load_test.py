@@ -0,0 +1,310 @@
+"""
+Repeatable load test for the API.
+
+Drives a weighted mix of browse, search, product detail, cart, checkout and
+admin requests, then reports p50/p95/p99 latency and throughput per route,
+and connection pool occupancy, hold time and checkout wait scraped from
+/metrics during the run. Results can be saved as a baseline and later runs
+compared against it.
+
+Usage (from the backend directory, after benchmarks.generate_data):
+    # against a running server (start it with RATE_LIMIT_ENABLED=false)
+    python -m benchmarks.load_test --base-url http://localhost:8000 --duration 60 --concurrency 32
+
+    # in-process against the ASGI app, no server needed (rate limiting is turned off)
+    python -m benchmarks.load_test --in-process --duration 30
+
+    python -m benchmarks.load_test --in-process --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load_test --in-process --baseline benchmarks/baseline.json --tolerance 0.2
+
+The comparison exits with status 1 when any route's p95 grows, or its
+throughput drops, by more than the tolerance.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+
+PASSWORD = "benchmark123"
+
+# (scenario, weight)
+MIX = [
+    ("browse", 30),
+    ("search", 15),
+    ("product_detail", 25),
+    ("category", 10),
+    ("cart", 10),
+    ("checkout", 5),
+    ("admin", 5),
+]
+
+
+# Scraped from /metrics while the test runs
+POOL_SAMPLE_INTERVAL = 0.5
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Unlabelled samples of the Prometheus text format"""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, _, value = line.partition(" ")
+            values[name] = float(value)
+    return values
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.product_ids: List[int] = []
+        self.category_slugs: List[str] = []
+        self.user_tokens: List[str] = []
+        self.admin_token: Optional[str] = None
+        self.metrics_headers: dict = {}
+        self.pool_in_use: List[float] = []
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        if response.status_code >= 400:
+            # Rejections and failures are usually fast and would drag the percentiles down
+            self.errors[route] += 1
+        else:
+            self.latencies[route].append(time.perf_counter() - start)
+        return response
+
+    async def login(self, email: str, password: str) -> Optional[str]:
+        response = await self.client.post("/api/auth/login", data={"username": email, "password": password})
+        if response.status_code != 200:
+            return None
+        return response.json()["access_token"]
+
+    async def setup(self, users: int, admin_email: Optional[str], admin_password: Optional[str]):
+        products = (await self.client.get("/api/products/", params={"limit": 100})).json()
+        self.product_ids = [p["id"] for p in products if p.get("stock", 0) > 10]
+        self.category_slugs = [c["slug"] for c in (await self.client.get("/api/categories/")).json()]
+        if not self.product_ids:
+            raise SystemExit("No products found. Run `python -m benchmarks.generate_data` first.")
+
+        # Log in a small pool of generated users up front; bcrypt makes logins expensive
+        candidates = self.rng.sample(range(1, users * 20 + 1), users * 20)
+        for user_id in candidates:
+            token = await self.login(f"user{user_id}@bench.pureglow.com", PASSWORD)
+            if token:
+                self.user_tokens.append(token)
+            if len(self.user_tokens) >= users:
+                break
+        if admin_email and admin_password:
+            self.admin_token = await self.login(admin_email, admin_password)
+
+    def user_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.user_tokens)}"} if self.user_tokens else {}
+
+    async def run_scenario(self, scenario: str):
+        rng = self.rng
+        if scenario == "browse":
+            await self.request("GET /api/products", "GET", "/api/products/", params={"limit": 24, "skip": rng.randint(0, 5) * 24})
+        elif scenario == "search":
+            term = rng.choice(["glow", "serum", "vitamin", "repair", "oil", "cream"])
+            await self.request("GET /api/products?search", "GET", "/api/products/", params={"search": term, "limit": 24})
+        elif scenario == "category" and self.category_slugs:
+            await self.request("GET /api/products?category", "GET", "/api/products/", params={
+                "category": rng.choice(self.category_slugs), "sort_by": rng.choice(["price_low", "rating", "newest"]), "limit": 24})
+        elif scenario == "product_detail":
+            await self.request("GET /api/products/{id}", "GET", f"/api/products/{rng.choice(self.product_ids)}")
+        elif scenario == "cart" and self.user_tokens:
+            headers = self.user_headers()
+            await self.request("POST /api/cart", "POST", "/api/cart/", headers=headers,
+                               json={"product_id": rng.choice(self.product_ids), "quantity": 1})
+            await self.request("GET /api/cart", "GET", "/api/cart/", headers=headers)
+        elif scenario == "checkout" and self.user_tokens:
+            items = [{"product_id": pid, "quantity": 1} for pid in rng.sample(self.product_ids, min(3, len(self.product_ids)))]
+            await self.request("POST /api/orders", "POST", "/api/orders/", headers=self.user_headers(), json={
+                "items": items, "shipping_address": {"city": "Bengaluru"}, "payment_method": "cod"})
+        elif scenario == "admin" and self.admin_token:
+            headers = {"Authorization": f"Bearer {self.admin_token}"}
+            if rng.random() < 0.5:
+                await self.request("GET /api/admin/orders", "GET", "/api/admin/orders", headers=headers, params={"limit": 50})
+            else:
+                await self.request("GET /api/admin/stats", "GET", "/api/admin/stats", headers=headers)
+
+    async def scrape_metrics(self) -> Optional[Dict[str, float]]:
+        try:
+            response = await self.client.get("/metrics", headers=self.metrics_headers)
+        except httpx.HTTPError:
+            return None
+        return parse_metrics(response.text) if response.status_code == 200 else None
+
+    async def sample_pool(self, deadline: float):
+        while time.perf_counter() < deadline:
+            metrics = await self.scrape_metrics()
+            if metrics and "db_pool_checked_out" in metrics:
+                self.pool_in_use.append(metrics["db_pool_checked_out"])
+            await asyncio.sleep(POOL_SAMPLE_INTERVAL)
+
+    def pool_report(self, before: Optional[Dict[str, float]], after: Optional[Dict[str, float]]) -> Optional[dict]:
+        if not before or not after or not self.pool_in_use:
+            return None
+
+        def mean_ms(histogram: str) -> float:
+            count = after.get(f"{histogram}_count", 0) - before.get(f"{histogram}_count", 0)
+            total = after.get(f"{histogram}_sum", 0) - before.get(f"{histogram}_sum", 0)
+            return round(total / count * 1000, 2) if count else 0.0
+
+        return {
+            "size": after.get("db_pool_size"),
+            "mean_checked_out": round(statistics.fmean(self.pool_in_use), 2),
+            "max_checked_out": max(self.pool_in_use),
+            "mean_hold_ms": mean_ms("db_pool_hold_seconds"),
+            "mean_checkout_wait_ms": mean_ms("db_pool_checkout_wait_seconds"),
+            "reacquired": after.get("db_session_reacquired_total", 0) - before.get("db_session_reacquired_total", 0),
+        }
+
+    async def worker(self, deadline: float):
+        scenarios = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        while time.perf_counter() < deadline:
+            await self.run_scenario(self.rng.choices(scenarios, weights=weights)[0])
+
+    async def run(self, duration: float, concurrency: int) -> dict:
+        before = await self.scrape_metrics()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(self.sample_pool(deadline), *(self.worker(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        after = await self.scrape_metrics()
+
+        routes = {}
+        # Latency and throughput cover successful responses only
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(route, [])
+            routes[route] = {
+                "requests": len(values) + self.errors.get(route, 0),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+            }
+        succeeded = sum(len(v) for v in self.latencies.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "concurrency": concurrency,
+            "total_requests": succeeded + sum(self.errors.values()),
+            "throughput_rps": round(succeeded / elapsed, 2),
+            "routes": routes,
+            "pool": self.pool_report(before, after),
+        }
+
+
+def print_report(results: dict):
+    print(f"\n{results['total_requests']} requests in {results['duration_s']}s "
+          f"({results['throughput_rps']} req/s, concurrency {results['concurrency']})\n")
+    print(f"{'route':<32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in results["routes"].items():
+        print(f"{route:<32} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    pool = results.get("pool")
+    if pool:
+        print(f"\nDB pool (size {pool['size']:.0f}): {pool['mean_checked_out']} checked out on average, "
+              f"max {pool['max_checked_out']:.0f}; mean hold {pool['mean_hold_ms']}ms, "
+              f"mean checkout wait {pool['mean_checkout_wait_ms']}ms, {pool['reacquired']:.0f} reacquired after release")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for route, base in baseline["routes"].items():
+        current = results["routes"].get(route)
+        if current is None:
+            continue
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if base["throughput_rps"] > 0 and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+async def main(args) -> int:
+    if args.in_process:
+        # All in-process traffic comes from one client address, which the rate limiter would throttle
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        from app.main import app
+        # Unhandled exceptions come back as 500s and count as errors instead of ending the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        base_url = "http://testserver"
+        # Run startup and shutdown as in production: pool prewarm, cache listener, periodic jobs
+        lifespan = app.router.lifespan_context(app)
+    else:
+        transport = None
+        base_url = args.base_url
+        lifespan = contextlib.nullcontext()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with lifespan:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=30.0) as client:
+            test = LoadTest(client, random.Random(args.seed))
+            if args.metrics_token:
+                test.metrics_headers = {"Authorization": f"Bearer {args.metrics_token}"}
+            await test.setup(args.users, args.admin_email, args.admin_password)
+            results = await test.run(args.duration, args.concurrency)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Daily Care Store API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Drive the ASGI app directly instead of a server")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=10, help="Number of generated users to log in")
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--metrics-token", help="METRICS_TOKEN of the server, for the pool report")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--save-baseline", help="Save results as the new baseline")
+    parser.add_argument("--baseline", help="Compare results against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
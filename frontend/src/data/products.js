@@ -155,3 +155,19 @@ export const fetchCategories = async () => {
     return categories;
   }
 };
+
+// Matching product counts per category, product type and price bucket for the filter sidebar
+export const fetchFacets = async ({ category, type, minPrice, maxPrice } = {}) => {
+  try {
+    const params = new URLSearchParams();
+    if (category) params.append('category', category);
+    if (type) params.append('product_type', type);
+    if (minPrice != null) params.append('min_price', minPrice);
+    if (maxPrice != null) params.append('max_price', maxPrice);
+    const res = await fetch(`${API_URL}/api/products/facets?${params.toString()}`);
+    return res.ok ? await res.json() : null;
+  } catch (error) {
+    console.error('Failed to fetch facets:', error);
+    return null;
+  }
+};
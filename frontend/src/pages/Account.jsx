@@ -9,12 +9,19 @@ import { AuthContext } from '../App';
 import { API_URL } from '../data/products';
 import './Account.css';
 
+const ORDERS_PAGE_SIZE = 10;
+
 const Account = () => {
   const { user, token, logout, login } = useContext(AuthContext);
   const navigate = useNavigate();
   const [activeTab, setActiveTab] = useState('orders');
   const [orders, setOrders] = useState([]);
+  const [statusCounts, setStatusCounts] = useState({});
+  const [hasMore, setHasMore] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Orders moved to cold storage are fetched separately once the live history runs out
+  const [archived, setArchived] = useState({ loaded: 0, done: false });
   const [isEditing, setIsEditing] = useState(false);
   const [saving, setSaving] = useState(false);
   const [message, setMessage] = useState({ type: '', text: '' });
@@ -38,19 +45,44 @@ const Account = () => {
     });
   }, [user, token]);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (skip = 0) => {
+    if (skip > 0) setLoadingMore(true);
     try {
-      const res = await fetch(`${API_URL}/api/orders`, {
+      const res = await fetch(`${API_URL}/api/orders?skip=${skip}&limit=${ORDERS_PAGE_SIZE}`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (res.ok) {
         const data = await res.json();
-        setOrders(data);
+        setOrders(prev => skip === 0 ? data.items : [...prev, ...data.items]);
+        setHasMore(data.has_more);
+        if (data.status_counts) setStatusCounts(data.status_counts);
       }
     } catch (error) {
       console.error('Failed to fetch orders:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  const fetchArchivedOrders = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`${API_URL}/api/orders/archive?skip=${archived.loaded}&limit=${ORDERS_PAGE_SIZE}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (res.ok) {
+        const data = await res.json();
+        setOrders(prev => [
+          ...prev,
+          ...data.map(order => ({ ...order, item_count: order.items.reduce((count, item) => count + item.quantity, 0) }))
+        ]);
+        setArchived({ loaded: archived.loaded + data.length, done: data.length < ORDERS_PAGE_SIZE });
+      }
+    } catch (error) {
+      console.error('Failed to fetch archived orders:', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -118,6 +150,8 @@ const Account = () => {
   const pendingOrders = orders.filter(o => ['pending', 'confirmed', 'shipped'].includes(o.status));
   const completedOrders = orders.filter(o => o.status === 'delivered');
   const cancelledOrders = orders.filter(o => o.status === 'cancelled');
+  const totalOrders = Object.values(statusCounts).reduce((sum, count) => sum + count, 0);
+  const activeOrders = ['pending', 'confirmed', 'shipped'].reduce((sum, s) => sum + (statusCounts[s] || 0), 0);
 
   if (!user) return null;
 
@@ -173,15 +207,15 @@ const Account = () => {
               {/* Order Stats */}
               <div className="order-stats">
                 <div className="stat-card">
-                  <span className="stat-number">{orders.length}</span>
+                  <span className="stat-number">{totalOrders}</span>
                   <span className="stat-label">Total Orders</span>
                 </div>
                 <div className="stat-card pending">
-                  <span className="stat-number">{pendingOrders.length}</span>
+                  <span className="stat-number">{activeOrders}</span>
                   <span className="stat-label">In Progress</span>
                 </div>
                 <div className="stat-card completed">
-                  <span className="stat-number">{completedOrders.length}</span>
+                  <span className="stat-number">{statusCounts.delivered || 0}</span>
                   <span className="stat-label">Delivered</span>
                 </div>
               </div>
@@ -216,7 +250,7 @@ const Account = () => {
                             <div className="order-details">
                               <div className="order-info">
                                 <span>Date: {new Date(order.created_at).toLocaleDateString()}</span>
-                                <span>Items: {order.items?.length || 0}</span>
+                                <span>Items: {order.item_count}</span>
                               </div>
                               <div className="order-total">
                                 <span>Total</span>
@@ -246,7 +280,7 @@ const Account = () => {
                             <div className="order-details">
                               <div className="order-info">
                                 <span>Date: {new Date(order.created_at).toLocaleDateString()}</span>
-                                <span>Items: {order.items?.length || 0}</span>
+                                <span>Items: {order.item_count}</span>
                               </div>
                               <div className="order-total">
                                 <span>Total</span>
@@ -258,6 +292,17 @@ const Account = () => {
                       </div>
                     </div>
                   )}
+
+                  {hasMore && (
+                    <button onClick={() => fetchOrders(orders.length)} className="shop-btn" disabled={loadingMore}>
+                      {loadingMore ? 'Loading...' : 'Load More Orders'}
+                    </button>
+                  )}
+                  {!hasMore && !archived.done && (
+                    <button onClick={fetchArchivedOrders} className="shop-btn" disabled={loadingMore}>
+                      {loadingMore ? 'Loading...' : 'Show Older Orders'}
+                    </button>
+                  )}
                 </>
               )}
             </motion.div>
@@ -1,4 +1,4 @@
-import { useState, useContext } from 'react';
+import { useState, useContext, useRef } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { MapPin, CreditCard, Truck, ArrowLeft, CheckCircle } from 'lucide-react';
@@ -14,6 +14,8 @@ const Checkout = () => {
   const [error, setError] = useState('');
   const [orderPlaced, setOrderPlaced] = useState(false);
   const [orderId, setOrderId] = useState(null);
+  // Reused when a network error is retried so the order is only placed once
+  const idempotencyKey = useRef(crypto.randomUUID());
   
   const [formData, setFormData] = useState({
     fullName: user?.full_name || '',
@@ -72,7 +74,8 @@ const Checkout = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
+          'Authorization': `Bearer ${token}`,
+          'Idempotency-Key': idempotencyKey.current
         },
         body: JSON.stringify(orderData)
       });
@@ -85,6 +88,7 @@ const Checkout = () => {
       } else {
         const err = await res.json();
         setError(err.detail || 'Failed to place order');
+        idempotencyKey.current = crypto.randomUUID();
       }
     } catch (err) {
       setError('Network error. Please try again.');
@@ -22,16 +22,12 @@ const ProductDetail = () => {
     const fetchProduct = async () => {
       setLoading(true);
       try {
-        const res = await fetch(`${API_URL}/api/products/${id}`);
+        // Product, related products and availability in one round trip
+        const res = await fetch(`${API_URL}/api/products/${id}/page`);
         if (res.ok) {
           const data = await res.json();
-          setProduct(data);
-          // Fetch related products from same category
-          const relatedRes = await fetch(`${API_URL}/api/products?category=${data.category?.slug || ''}&limit=4`);
-          if (relatedRes.ok) {
-            const relatedData = await relatedRes.json();
-            setRelatedProducts(relatedData.filter(p => p.id !== data.id).slice(0, 4));
-          }
+          setProduct(data.product);
+          setRelatedProducts(data.related);
         } else {
           setProduct(null);
         }
@@ -3,7 +3,7 @@ import { useParams, useSearchParams } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Filter, Grid, List, ChevronDown, X, SlidersHorizontal, Loader } from 'lucide-react';
 import ProductCard from '../components/ProductCard';
-import { categories, productTypes, fetchProducts } from '../data/products';
+import { categories, productTypes, fetchProducts, fetchFacets } from '../data/products';
 import './Products.css';
 
 const Products = () => {
@@ -19,11 +19,12 @@ const Products = () => {
   const [filteredProducts, setFilteredProducts] = useState([]);
   const [selectedCategory, setSelectedCategory] = useState(initialCategory);
   const [selectedType, setSelectedType] = useState(initialType);
-  const [sortBy, setSortBy] = useState('featured');
+  const [sortBy, setSortBy] = useState('trending');
   const [priceRange, setPriceRange] = useState([0, 5000]);
   const [isFilterOpen, setIsFilterOpen] = useState(false);
   const [viewMode, setViewMode] = useState('grid');
   const [isLoading, setIsLoading] = useState(true);
+  const [facets, setFacets] = useState(null);
 
   // Fetch products from API on mount
   useEffect(() => {
@@ -36,6 +37,25 @@ const Products = () => {
     loadProducts();
   }, []);
 
+  // Option counts for the sidebar; debounced so dragging the price slider doesn't flood the API
+  useEffect(() => {
+    const timer = setTimeout(async () => {
+      const data = await fetchFacets({
+        category: selectedCategory !== 'all' ? selectedCategory : null,
+        type: selectedType !== 'all' ? selectedType : null,
+        minPrice: priceRange[0] > 0 ? priceRange[0] : null,
+        maxPrice: priceRange[1] < 5000 ? priceRange[1] : null,
+      });
+      if (data) setFacets(data);
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [selectedCategory, selectedType, priceRange]);
+
+  const facetCount = (list, value) => {
+    if (!facets) return null;
+    return list.find(entry => entry.value === value)?.count ?? 0;
+  };
+
   // Update filters when URL changes
   useEffect(() => {
     const newCategory = category || categoryFromUrl || 'all';
@@ -73,6 +93,9 @@ const Products = () => {
       case 'newest':
         result = result.filter(p => p.isNew).concat(result.filter(p => !p.isNew));
         break;
+      case 'trending':
+        // The API already returns products by recent sales velocity
+        break;
       default:
         result.sort((a, b) => (b.isBestseller ? 1 : 0) - (a.isBestseller ? 1 : 0));
     }
@@ -152,6 +175,7 @@ const Products = () => {
                       onChange={() => setSelectedCategory(cat.id)}
                     />
                     <span>{cat.icon} {cat.name}</span>
+                    {facets && <span className="filter-count">{facetCount(facets.categories, cat.id)}</span>}
                   </label>
                 ))}
               </div>
@@ -181,6 +205,7 @@ const Products = () => {
                       onChange={() => setSelectedType(type.id)}
                     />
                     <span>{type.icon} {type.name}</span>
+                    {facets && <span className="filter-count">{facetCount(facets.product_types, type.id)}</span>}
                   </label>
                 ))}
               </div>
@@ -242,6 +267,7 @@ const Products = () => {
               <div className="toolbar-right">
                 <div className="sort-dropdown">
                   <select value={sortBy} onChange={(e) => setSortBy(e.target.value)}>
+                    <option value="trending">Trending</option>
                     <option value="featured">Featured</option>
                     <option value="newest">Newest</option>
                     <option value="price-low">Price: Low to High</option>
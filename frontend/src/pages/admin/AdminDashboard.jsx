@@ -1,4 +1,4 @@
-import { useState, useEffect, useContext } from 'react';
+import { useState, useEffect, useContext, useRef } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import {
@@ -56,86 +56,90 @@ const AdminDashboard = ({ onLogout }) => {
 
   const token = localStorage.getItem('token');
 
+  // Version of the last bootstrap, sent back as `since` to fetch only changes
+  const syncVersion = useRef(null);
+
   // Fetch all data on mount
   useEffect(() => {
     fetchDashboardData();
   }, []);
 
-  const fetchDashboardData = async () => {
-    setLoading(true);
-    await Promise.all([
-      fetchStats(),
-      fetchCategories(),
-      fetchProducts(),
-      fetchOrders(),
-      fetchUsers()
-    ]);
-    setLoading(false);
-  };
-
-  const fetchStats = async () => {
-    try {
-      const res = await fetch(`${API_URL}/api/admin/stats`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
-      if (res.ok) {
-        const data = await res.json();
-        setStats(data);
-      }
-    } catch (error) {
-      console.error('Failed to fetch stats:', error);
-    }
-  };
-
-  const fetchCategories = async () => {
-    try {
-      const res = await fetch(`${API_URL}/api/categories`);
-      if (res.ok) {
-        const data = await res.json();
-        setCategories(data);
-      }
-    } catch (error) {
-      console.error('Failed to fetch categories:', error);
-    }
-  };
-
-  const fetchProducts = async () => {
-    try {
-      const res = await fetch(`${API_URL}/api/products`);
-      if (res.ok) {
-        const data = await res.json();
-        setProducts(data);
+  // Live order feed: pull a delta whenever orders are created or change status
+  useEffect(() => {
+    if (!token) return;
+    let refreshTimer = null;
+    let reconnectTimer = null;
+    let source = null;
+    let closed = false;
+    const refresh = () => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(fetchDashboardData, 500);
+    };
+    // EventSource can't send the Authorization header, so each connection uses a
+    // single-use ticket; its own reconnects would reuse a spent one
+    const connect = async () => {
+      try {
+        const res = await fetch(`${API_URL}/api/admin/orders/stream-ticket`, {
+          method: 'POST',
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!res.ok || closed) return;
+        const { ticket } = await res.json();
+        source = new EventSource(`${API_URL}/api/admin/orders/stream?ticket=${encodeURIComponent(ticket)}`);
+        ['order-created', 'order-status-changed', 'resync'].forEach(type => source.addEventListener(type, refresh));
+        source.onerror = () => {
+          source.close();
+          if (!closed) reconnectTimer = setTimeout(connect, 3000);
+        };
+      } catch (error) {
+        if (!closed) reconnectTimer = setTimeout(connect, 3000);
       }
-    } catch (error) {
-      console.error('Failed to fetch products:', error);
-    }
-  };
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(refreshTimer);
+      clearTimeout(reconnectTimer);
+      if (source) source.close();
+    };
+  }, [token]);
 
-  const fetchOrders = async () => {
-    try {
-      const res = await fetch(`${API_URL}/api/admin/orders`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
-      if (res.ok) {
-        const data = await res.json();
-        setOrders(data);
-      }
-    } catch (error) {
-      console.error('Failed to fetch orders:', error);
-    }
+  const mergeById = (current, changed) => {
+    const byId = new Map(changed.map(item => [item.id, item]));
+    const updated = current.map(item => byId.get(item.id) || item);
+    const known = new Set(current.map(item => item.id));
+    return [...changed.filter(item => !known.has(item.id)), ...updated];
   };
 
-  const fetchUsers = async () => {
+  const fetchDashboardData = async () => {
+    const delta = syncVersion.current !== null;
+    if (!delta) setLoading(true);
     try {
-      const res = await fetch(`${API_URL}/api/admin/users`, {
+      const url = delta
+        ? `${API_URL}/api/admin/bootstrap?since=${encodeURIComponent(syncVersion.current)}`
+        : `${API_URL}/api/admin/bootstrap`;
+      const res = await fetch(url, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (res.ok) {
         const data = await res.json();
-        setUsers(data);
+        setStats(data.stats);
+        setCategories(data.categories);
+        if (data.full) {
+          setProducts(data.products);
+          setOrders(data.orders);
+          setUsers(data.users);
+        } else {
+          setProducts(prev => mergeById(prev, data.products));
+          setOrders(prev => mergeById(prev, data.orders));
+          setUsers(prev => mergeById(prev, data.users));
+        }
+        syncVersion.current = data.version;
       }
     } catch (error) {
-      console.error('Failed to fetch users:', error);
+      console.error('Failed to fetch dashboard data:', error);
+    } finally {
+      setLoading(false);
     }
   };
 
@@ -348,6 +352,7 @@ const AdminDashboard = ({ onLogout }) => {
       });
 
       if (res.ok) {
+        setProducts(prev => prev.filter(p => p.id !== productId));
         await fetchDashboardData();
         alert('Product deleted successfully!');
       } else {